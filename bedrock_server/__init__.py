@@ -1 +1,3 @@
 from ._server import BedrockServer
+from ._archive_writer import ArchiveWriter
+from ._command_queue import CommandQueue
@@ -0,0 +1,248 @@
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from subprocess import run, DEVNULL
+from typing import Any, Callable, Iterable, NamedTuple, TYPE_CHECKING
+import os
+import struct
+import zlib
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+class ArchiveMember(NamedTuple):
+    name: str
+    size: int
+    crc: int
+
+
+def _deflate_chunk(data: bytes, level: int, dictionary: bytes, final: bool) -> bytes:
+    """
+    Compresses one chunk of a member into raw deflate data that can be concatenated with the other chunks'.
+    :param dictionary: Up to the last 32 KiB of the previous chunk, so compression does not restart from nothing.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary) if dictionary else zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _throttle(nice: int, idle_io: bool) -> None:
+    if nice:
+        os.nice(nice)
+    if idle_io:
+        run(["ionice", "-c", "3", "-p", str(os.getpid())], stdout=DEVNULL, stderr=DEVNULL)
+
+
+class _ZipMember:
+
+    def __init__(self, name: str, mtime: float, stored: bool) -> None:
+        self.name = name
+        self.mtime = mtime
+        self.stored = stored
+        self.size = 0
+        self.crc = 0
+        self.compressed_size = 0
+        self.header_offset = 0
+
+
+class ArchiveWriter:
+    """
+    Writes backup archives, compressing across several processes and storing already compressed files as they are.
+
+    Formats are "zip" (deflate, each member split into chunks compressed in parallel and streamed into the archive in
+    order) and "tar.zst" (Zstandard with its own worker threads).
+    """
+
+    FORMATS = ("zip", "tar.zst")
+
+    _CHUNK_SIZE = 1024 * 1024
+    _DICTIONARY_SIZE = 32 * 1024
+    _STORED_SUFFIXES = {".ldb", ".png", ".jpg", ".jpeg", ".ogg", ".fsb", ".zip", ".mcpack", ".mcworld", ".gz", ".zst"}
+
+    def __init__(self, archive_format: str = "zip", level: int | None = None, workers: int | None = None, nice: int = 0, idle_io: bool = False) -> None:
+        """
+        :param level: Compression level, or None for the format's default.
+        :param workers: Compression processes or threads, or None for one per CPU.
+        :param nice: Niceness to add to the processes writing the archive.
+        :param idle_io: Give the processes writing the archive idle I/O priority, so they only use otherwise idle disk time.
+        :raises ValueError: If the format is not supported, or the level is out of range for it.
+        """
+        if archive_format not in self.FORMATS:
+            raise ValueError(f"Backup format must be one of: {', '.join(self.FORMATS)}")
+        if level is not None:
+            lowest, highest = self._level_range(archive_format)
+            if not lowest <= level <= highest:
+                raise ValueError(f"Compression level for {archive_format} must be between {lowest} and {highest}.")
+        self.archive_format = archive_format
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.nice = nice
+        self.idle_io = idle_io
+
+    @staticmethod
+    def _level_range(archive_format: str) -> tuple[int, int]:
+        if archive_format == "tar.zst":
+            from compression.zstd import CompressionParameter
+            return CompressionParameter.compression_level.bounds()
+        return 0, 9
+
+    @property
+    def suffix(self) -> str:
+        return f".{self.archive_format}"
+
+    def write(self, path: Path, entries: Iterable[tuple[str, Path, int | None]]) -> list[ArchiveMember]:
+        """
+        Writes the archive, in a separate throttled process if niceness or idle I/O was asked for.
+        :param entries: Archive name, source path and length to copy (None for the whole file) for every file.
+        :return: Name, size and CRC-32 of every member written
+        """
+        return self.run_throttled(self._write, path, list(entries))
+
+    def run_throttled(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Runs the function with this writer's niceness and I/O priority, in a separate process if either was asked for,
+        so the calling process keeps its own priorities. The function and its arguments must then be picklable.
+        :return: What the function returned
+        """
+        if not self.nice and not self.idle_io:
+            return function(*args)
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=1, initializer=_throttle, initargs=(self.nice, self.idle_io)) as throttled:
+            return throttled.submit(function, *args).result()
+
+    def _write(self, path: Path, entries: list[tuple[str, Path, int | None]]) -> list[ArchiveMember]:
+        if self.archive_format == "tar.zst":
+            return self._write_tar_zst(path, entries)
+        return self._write_zip(path, entries)
+
+    def _write_tar_zst(self, path: Path, entries: list[tuple[str, Path, int | None]]) -> list[ArchiveMember]:
+        from compression.zstd import CompressionParameter
+        import tarfile
+        options = {CompressionParameter.nb_workers: self.workers}
+        if self.level is not None:
+            options[CompressionParameter.compression_level] = self.level
+        members = []
+        with tarfile.open(path, "w:zst", options=options) as archive:
+            for name, source_path, length in entries:
+                info = archive.gettarinfo(source_path, name)
+                if length is not None:
+                    info.size = min(length, info.size)
+                with open(source_path, "rb") as source:
+                    crc = 0
+                    remaining = info.size
+                    while remaining > 0 and (chunk := source.read(min(self._CHUNK_SIZE, remaining))):
+                        crc = zlib.crc32(chunk, crc)
+                        remaining -= len(chunk)
+                    source.seek(0)
+                    archive.addfile(info, source)
+                members.append(ArchiveMember(name, info.size, crc))
+        return members
+
+    def _write_zip(self, path: Path, entries: list[tuple[str, Path, int | None]]) -> list[ArchiveMember]:
+        """
+        Reads members in order and queues their headers, chunks and header fixups, so chunks of many members compress
+        at once while the archive is written strictly in order.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        members: list[_ZipMember] = []
+        try:
+            with open(path, "wb") as archive:
+                pending: deque[tuple[str, _ZipMember, "bytes | Future | None"]] = deque()
+
+                def flush(keep: int) -> None:
+                    while len(pending) > keep:
+                        step, member, data = pending.popleft()
+                        if step == "header":
+                            member.header_offset = archive.tell()
+                            archive.write(self._local_header(member.name, member.mtime, member.stored))
+                        elif step == "data":
+                            data = data if isinstance(data, bytes) else data.result()
+                            archive.write(data)
+                            member.compressed_size += len(data)
+                        else:
+                            end_offset = archive.tell()
+                            archive.seek(member.header_offset + 14)
+                            archive.write(struct.pack("<I", member.crc))
+                            archive.seek(member.header_offset + 30 + len(member.name.encode()) + 4)
+                            archive.write(struct.pack("<QQ", member.size, member.compressed_size))
+                            archive.seek(end_offset)
+
+                for name, source_path, length in entries:
+                    stat = source_path.stat()
+                    member = _ZipMember(name, stat.st_mtime, source_path.suffix.lower() in self._STORED_SUFFIXES)
+                    members.append(member)
+                    pending.append(("header", member, None))
+                    dictionary = b""
+                    with open(source_path, "rb") as source:
+                        remaining = stat.st_size if length is None else min(length, stat.st_size)
+                        while True:
+                            chunk = source.read(min(self._CHUNK_SIZE, remaining))
+                            remaining -= len(chunk)
+                            final = remaining <= 0 or not chunk
+                            member.size += len(chunk)
+                            member.crc = zlib.crc32(chunk, member.crc)
+                            if member.stored:
+                                data = chunk
+                            elif pool is not None:
+                                data = pool.submit(_deflate_chunk, chunk, level, dictionary, final)
+                            else:
+                                data = _deflate_chunk(chunk, level, dictionary, final)
+                            pending.append(("data", member, data))
+                            dictionary = chunk[-self._DICTIONARY_SIZE:]
+                            flush(self.workers * 4)
+                            if final:
+                                break
+                    pending.append(("end", member, None))
+                flush(0)
+                self._write_central_directory(archive, members)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        return [ArchiveMember(member.name, member.size, member.crc) for member in members]
+    @staticmethod
+    def _dos_time(mtime: float) -> tuple[int, int]:
+        timestamp = datetime.fromtimestamp(max(mtime, 315532800))
+        dos_time = timestamp.hour << 11 | timestamp.minute << 5 | timestamp.second // 2
+        dos_date = (timestamp.year - 1980) << 9 | timestamp.month << 5 | timestamp.day
+        return dos_time, dos_date
+
+    def _local_header(self, name: str, mtime: float, stored: bool) -> bytes:
+        """
+        Local file header with the CRC-32 and sizes left blank, to be filled in once the member is written.
+        Sizes always go in a ZIP64 extra field, so members of any size can be streamed.
+        """
+        encoded_name = name.encode()
+        dos_time, dos_date = self._dos_time(mtime)
+        zip64_extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45, 0x0800, 0 if stored else 8, dos_time, dos_date,
+            0, 0xFFFFFFFF, 0xFFFFFFFF, len(encoded_name), len(zip64_extra)
+        ) + encoded_name + zip64_extra
+
+    def _write_central_directory(self, archive, members: list[_ZipMember]) -> None:
+        directory_offset = archive.tell()
+        for member in members:
+            name, stored, crc, compressed_size, size, header_offset = (
+                member.name, member.stored, member.crc, member.compressed_size, member.size, member.header_offset
+            )
+            encoded_name = name.encode()
+            dos_time, dos_date = self._dos_time(member.mtime)
+            zip64_values = [value for value in (size, compressed_size, header_offset) if value >= 0xFFFFFFFF]
+            extra = struct.pack(f"<HH{len(zip64_values)}Q", 0x0001, 8 * len(zip64_values), *zip64_values) if zip64_values else b""
+            archive.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, 0x0300 | 45, 45, 0x0800, 0 if stored else 8, dos_time, dos_date, crc,
+                min(compressed_size, 0xFFFFFFFF), min(size, 0xFFFFFFFF), len(encoded_name), len(extra), 0, 0, 0,
+                0o100644 << 16, min(header_offset, 0xFFFFFFFF)
+            ) + encoded_name + extra)
+        directory_end = archive.tell()
+        count = len(members)
+        directory_size = directory_end - directory_offset
+        if count >= 0xFFFF or directory_size >= 0xFFFFFFFF or directory_offset >= 0xFFFFFFFF:
+            archive.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, directory_size, directory_offset))
+            archive.write(struct.pack("<IIQI", 0x07064B50, 0, directory_end, 1))
+        archive.write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(directory_size, 0xFFFFFFFF), min(directory_offset, 0xFFFFFFFF), 0
+        ))
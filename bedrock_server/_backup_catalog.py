@@ -0,0 +1,109 @@
+from contextlib import AbstractContextManager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable
+from ._file_utils import file_lock, write_json_atomically
+import json
+
+
+class BackupCatalog:
+    """
+    Persistent record of a server's backups, kept in creation order and updated as backups are created and deleted, so
+    nothing has to list the backups folder or parse file names.
+
+    Each backup has its creation time, size in bytes, type and the server version it was made from. Snapshots share
+    blobs, so a snapshot's size is what it added to the backup store, and the store's actual size is kept separately.
+    """
+
+    def __init__(self, path: Path, rebuild: Callable[[], dict]) -> None:
+        """
+        :param rebuild: Builds the catalog from the backups folder, for when there is no catalog yet.
+        """
+        self.path = path
+        self._rebuild = rebuild
+
+    def _lock(self) -> AbstractContextManager[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return file_lock(self.path.with_name(f"{self.path.name}.lock"))
+
+    def _read(self) -> dict | None:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, catalog: dict) -> None:
+        write_json_atomically(self.path, catalog)
+
+    def load(self, save_rebuilt: bool = True) -> dict:
+        """
+        :param save_rebuilt: Save the catalog if it has to be rebuilt, creating the backups folder if needed.
+        :return: Backup names mapped to their details in creation order, and the backup store's size
+        """
+        catalog = self._read()
+        if catalog is not None:
+            return catalog
+        if not save_rebuilt:
+            return self._rebuild_sorted()
+        with self._lock():
+            return self._read_or_rebuild()
+
+    def _rebuild_sorted(self) -> dict:
+        catalog = self._rebuild()
+        catalog["backups"] = dict(sorted(catalog["backups"].items(), key=lambda item: item[1]["created"]))
+        return catalog
+
+    def _read_or_rebuild(self) -> dict:
+        catalog = self._read()
+        if catalog is None:
+            catalog = self._rebuild_sorted()
+            self._write(catalog)
+        return catalog
+
+    def add(self, name: str, backup_type: str, size: int, version: str | None, created: float, store_growth: int = 0) -> None:
+        """
+        :param store_growth: Bytes the backup added to the backup store.
+        """
+        with self._lock():
+            catalog = self._read_or_rebuild()
+            catalog["backups"][name] = {"created": created, "size": size, "type": backup_type, "version": version}
+            catalog["store_size"] += store_growth
+            self._write(catalog)
+
+    def remove(self, names: Iterable[str], store_size: int | None = None) -> None:
+        """
+        :param store_size: Size of the backup store after removing the backups, if it changed.
+        """
+        with self._lock():
+            catalog = self._read_or_rebuild()
+            for name in names:
+                catalog["backups"].pop(name, None)
+            if store_size is not None:
+                catalog["store_size"] = store_size
+            self._write(catalog)
+
+    @staticmethod
+    def disk_usage(catalog: dict) -> int:
+        return catalog["store_size"] + sum(backup["size"] for backup in catalog["backups"].values() if backup["type"] != "snapshot")
+
+    @staticmethod
+    def expired(catalog: dict, keep_last: int, hourly: int = 0, daily: int = 0, weekly: int = 0) -> list[str]:
+        """
+        Grandfather-father-son retention: keeps the newest backups, then the newest backup of each of the most recent
+        hours, days and ISO weeks that have backups.
+        :return: Names of the backups the policy does not keep, oldest first
+        """
+        newest_first = list(reversed(catalog["backups"]))
+        keep = set(newest_first[:keep_last])
+        for count, period_format in ((hourly, "%Y-%m-%d %H"), (daily, "%Y-%m-%d"), (weekly, "%G-%V")):
+            periods = set()
+            for name in newest_first:
+                period = datetime.fromtimestamp(catalog["backups"][name]["created"]).strftime(period_format)
+                if period in periods:
+                    continue
+                if len(periods) >= count:
+                    break
+                periods.add(period)
+                keep.add(name)
+        return [name for name in catalog["backups"] if name not in keep]
@@ -0,0 +1,135 @@
+from hashlib import sha256
+from pathlib import Path
+from typing import Iterable
+from ._file_utils import write_json_atomically
+import json
+import os
+import zlib
+
+
+class BackupStore:
+    """
+    Deduplicated backup storage. Every unique file content is stored once as a compressed blob named by its SHA-256,
+    and each snapshot is a small manifest mapping archive names to blobs.
+    """
+
+    SNAPSHOT_SUFFIX = ".snapshot"
+
+    _BLOBS_DIR_NAME = "blobs"
+    _CHUNK_SIZE = 1024 * 1024
+    _COMPRESSION_LEVEL = 6
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+
+    @property
+    def _blobs_folder(self) -> Path:
+        return self.folder.joinpath(self._BLOBS_DIR_NAME)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._blobs_folder.joinpath(digest[:2], digest)
+
+    def snapshot_path(self, name: str) -> Path:
+        return self.folder.joinpath(f"{name}{self.SNAPSHOT_SUFFIX}")
+
+    def list_snapshots(self) -> list[str]:
+        return sorted(path.stem for path in self.folder.glob(f"*{self.SNAPSHOT_SUFFIX}"))
+
+    def read_manifest(self, name: str) -> dict:
+        with open(self.snapshot_path(name), "r") as file:
+            return json.load(file)
+
+    def write_snapshot(self, name: str, entries: Iterable[tuple[str, Path, int | None]]) -> dict:
+        """
+        :param entries: Archive name, source path and length to copy (None for the whole file) for every file.
+        :return: The written manifest, including the bytes of new blobs it added to the store
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        previous_files = self._latest_files()
+        files = {}
+        added_size = 0
+        for arcname, path, length in entries:
+            stat = path.stat()
+            size = stat.st_size if length is None else min(length, stat.st_size)
+            previous = previous_files.get(arcname)
+            if (previous is not None and previous["size"] == size and previous["mtime_ns"] == stat.st_mtime_ns
+                    and self._blob_path(previous["sha256"]).is_file()):
+                digest = previous["sha256"]
+            else:
+                digest, stored_size = self._store_blob(path, size)
+                added_size += stored_size
+            files[arcname] = {"sha256": digest, "size": size, "mtime_ns": stat.st_mtime_ns}
+        manifest = {"files": files, "added_size": added_size}
+        write_json_atomically(self.snapshot_path(name), manifest)
+        return manifest
+
+    def delete_snapshots(self, names: Iterable[str]) -> int:
+        """
+        :return: Size in bytes of the blobs left in the store
+        """
+        for name in names:
+            self.snapshot_path(name).unlink(missing_ok=True)
+        return self.collect_garbage()
+
+    def collect_garbage(self) -> int:
+        """
+        Deletes blobs that no remaining snapshot references.
+        :return: Size in bytes of the blobs left in the store
+        """
+        referenced = set()
+        for name in self.list_snapshots():
+            referenced.update(file["sha256"] for file in self.read_manifest(name)["files"].values())
+        if not self._blobs_folder.is_dir():
+            return 0
+        remaining_size = 0
+        for blob in self._blobs_folder.glob("*/*"):
+            if blob.name not in referenced:
+                blob.unlink()
+            else:
+                remaining_size += blob.stat().st_size
+        return remaining_size
+
+    def stored_size(self) -> int:
+        """
+        :return: Size in bytes of all blobs in the store
+        """
+        return sum(blob.stat().st_size for blob in self._blobs_folder.glob("*/*"))
+
+    def read_blob(self, digest: str) -> Iterable[bytes]:
+        decompressor = zlib.decompressobj()
+        with open(self._blob_path(digest), "rb") as blob:
+            while chunk := blob.read(self._CHUNK_SIZE):
+                yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    def _latest_files(self) -> dict[str, dict]:
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return {}
+        return self.read_manifest(snapshots[-1])["files"]
+
+    def _store_blob(self, path: Path, size: int) -> tuple[str, int]:
+        """
+        Hashes and compresses the first size bytes of the file in one pass, keeping the blob only if it is new.
+        :return: SHA-256 of the stored content, and the size of the blob if it is new or else 0
+        """
+        self._blobs_folder.mkdir(parents=True, exist_ok=True)
+        hasher = sha256()
+        compressor = zlib.compressobj(self._COMPRESSION_LEVEL)
+        partial_path = self._blobs_folder.joinpath(f"{os.getpid()}.part")
+        with open(path, "rb") as source, open(partial_path, "wb") as destination:
+            remaining = size
+            while remaining > 0 and (chunk := source.read(min(self._CHUNK_SIZE, remaining))):
+                remaining -= len(chunk)
+                hasher.update(chunk)
+                destination.write(compressor.compress(chunk))
+            destination.write(compressor.flush())
+        digest = hasher.hexdigest()
+        blob_path = self._blob_path(digest)
+        if blob_path.is_file():
+            partial_path.unlink()
+            return digest, 0
+        blob_path.parent.mkdir(exist_ok=True)
+        stored_size = partial_path.stat().st_size
+        partial_path.rename(blob_path)
+        return digest, stored_size
@@ -0,0 +1,100 @@
+from time import monotonic, sleep
+from itertools import count
+from typing import TYPE_CHECKING
+import heapq
+
+if TYPE_CHECKING:
+    from ._server import BedrockServer
+
+
+class CommandQueue:
+    """
+    Console commands for one or more servers, each due some time after the queue starts running.
+
+    Every command a server has due at once goes to it in one injection, and a token bucket per server limits how many
+    commands it gets per second, so large broadcasts reach the console in a few batches instead of flooding it.
+    """
+
+    COUNTDOWN_MARKS = (600, 300, 120, 60, 30, 10, 5, 4, 3, 2, 1)
+
+    def __init__(self, commands_per_second: float = 10.0, burst: int = 64) -> None:
+        """
+        :param commands_per_second: Rate at which each server's allowance of commands refills.
+        :param burst: Most commands a server can be sent at once.
+        """
+        self.commands_per_second = commands_per_second
+        self.burst = burst
+        self._servers: dict[str, "BedrockServer"] = {}
+        # Due time, insertion order, server name and command
+        self._pending: list[tuple[float, int, str, str]] = []
+        self._order = count()
+
+    def add(self, servers: "list[BedrockServer]", commands: list[str], delay_seconds: float = 0.0) -> None:
+        for server in servers:
+            self._servers[server.server_name] = server
+            for command in commands:
+                heapq.heappush(self._pending, (delay_seconds, next(self._order), server.server_name, command))
+
+    def say(self, servers: "list[BedrockServer]", messages: list[str], delay_seconds: float = 0.0) -> None:
+        """
+        :param messages: Chat messages, optionally using "&" instead of "§" for styling.
+        """
+        from ._server import BedrockServer
+        self.add(servers, [BedrockServer.say_command(message) for message in messages], delay_seconds)
+
+    def countdown(self, servers: "list[BedrockServer]", seconds: int, message_format: str = "Server restarting in {time}.") -> float:
+        """
+        Announces the time left at the start and at usual marks like a minute, ten seconds and each of the last five.
+        :param message_format: Message with a {time} placeholder, like "5 minutes" or "1 second".
+        :return: Seconds from the start until the countdown ends, for scheduling what comes after it
+        """
+        marks = sorted({seconds, *(mark for mark in self.COUNTDOWN_MARKS if mark < seconds)}, reverse=True)
+        for mark in marks:
+            if mark % 60 == 0:
+                time = f"{mark // 60} minute{'s' if mark != 60 else ''}"
+            else:
+                time = f"{mark} second{'s' if mark != 1 else ''}"
+            self.say(servers, [message_format.format(time=time)], seconds - mark)
+        return float(seconds)
+
+    def run(self, until_seconds: float = 0.0) -> dict[str, int]:
+        """
+        Sends every queued command, blocking until the last one is sent. Servers that are not running are skipped.
+        :param until_seconds: Keep blocking until at least this many seconds after starting, like the end of a countdown.
+        :return: How many injections each server got
+        """
+        from ._server import BedrockServer
+        running = set(BedrockServer.list_online_servers())
+        started = monotonic()
+        tokens = {server_name: float(self.burst) for server_name in self._servers}
+        refilled = {server_name: started for server_name in self._servers}
+        injections = {server_name: 0 for server_name in self._servers}
+        # Commands already due, in order, that wait for their server to have tokens for them
+        held: dict[str, list[str]] = {}
+        while self._pending or held:
+            now = monotonic()
+            while self._pending and started + self._pending[0][0] <= now:
+                _, _, server_name, command = heapq.heappop(self._pending)
+                if server_name in running:
+                    held.setdefault(server_name, []).append(command)
+            wake = started + self._pending[0][0] if self._pending else float("inf")
+            for server_name, commands in list(held.items()):
+                tokens[server_name] = min(float(self.burst), tokens[server_name] + (now - refilled[server_name]) * self.commands_per_second)
+                refilled[server_name] = now
+                # Once the rate limit holds commands back, wait until they can go together rather than one at a time
+                batch_size = min(len(commands), self.burst)
+                if tokens[server_name] < batch_size:
+                    wake = min(wake, now + (batch_size - tokens[server_name]) / self.commands_per_second)
+                    continue
+                tokens[server_name] -= batch_size
+                self._servers[server_name].execute(commands[:batch_size])
+                injections[server_name] += 1
+                del commands[:batch_size]
+                if commands:
+                    wake = min(wake, now + min(len(commands), self.burst) / self.commands_per_second)
+                else:
+                    del held[server_name]
+            if wake != float("inf"):
+                sleep(max(0.0, wake - monotonic()))
+        sleep(max(0.0, started + until_seconds - monotonic()))
+        return injections
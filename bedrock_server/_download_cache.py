@@ -0,0 +1,135 @@
+from contextlib import AbstractContextManager
+from hashlib import sha256
+from pathlib import Path
+from urllib.parse import urlparse
+from ._file_utils import file_lock, write_json_atomically
+import json
+import requests
+
+
+class DownloadCache:
+    """
+    Host-wide cache of downloaded server archives, shared by every server.
+    Archives are streamed to disk, so memory use does not grow with archive size, and interrupted downloads are resumed
+    with HTTP Range requests.
+    """
+
+    _CHUNK_SIZE = 1024 * 1024
+    _TIMEOUT_SECONDS = 30
+    _KEEP_ARCHIVES = 3
+    # Archives whose digest was already checked by this process, keyed by path, inode, size and modification time
+    _VERIFIED: set[tuple[Path, int, int, int]] = set()
+
+    def __init__(self, folder: Path, headers: dict[str, str]) -> None:
+        self.folder = folder
+        self.headers = headers
+
+    def _archive_path(self, url: str) -> Path:
+        url_key = sha256(url.encode()).hexdigest()[:16]
+        return self.folder.joinpath(f"{url_key}-{Path(urlparse(url).path).name}")
+
+    @staticmethod
+    def _record_path(archive_path: Path) -> Path:
+        return archive_path.with_name(f"{archive_path.name}.json")
+
+    @staticmethod
+    def _partial_path(archive_path: Path) -> Path:
+        return archive_path.with_name(f"{archive_path.name}.part")
+
+    @staticmethod
+    def _lock(archive_path: Path) -> AbstractContextManager[None]:
+        return file_lock(archive_path.with_name(f"{archive_path.name}.lock"))
+
+    def cached(self, url: str) -> Path | None:
+        """
+        :return: Path of the complete cached archive for the URL, or None if it is not cached, is incomplete or is corrupt
+        """
+        archive_path = self._archive_path(url)
+        try:
+            with open(self._record_path(archive_path), "r") as file:
+                record = json.load(file)
+            stat = archive_path.stat()
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get("url") != url or stat.st_size != record.get("size"):
+            return None
+        key = (archive_path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key not in self._VERIFIED:
+            if self._digest(archive_path) != record.get("sha256"):
+                return None
+            self._VERIFIED.add(key)
+        return archive_path
+
+    def _digest(self, path: Path) -> str:
+        hasher = sha256()
+        with open(path, "rb") as file:
+            while chunk := file.read(self._CHUNK_SIZE):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def fetch(self, url: str) -> Path:
+        """
+        :return: Path of the cached archive, downloading or resuming the download first if needed
+        :raises TimeoutError: If the download times out.
+        :raises ConnectionError: If the download is unsuccessful.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        archive_path = self._archive_path(url)
+        with self._lock(archive_path):
+            if self.cached(url) is not None:
+                self._record_path(archive_path).touch()
+                return archive_path
+            try:
+                self._download(url, archive_path)
+            except requests.Timeout:
+                raise TimeoutError("Request for server download timed out.")
+            except requests.RequestException:
+                raise ConnectionError("Request for server download unsuccessful.")
+        self._prune()
+        return archive_path
+
+    def _download(self, url: str, archive_path: Path) -> None:
+        partial_path = self._partial_path(archive_path)
+        partial_record_path = self._record_path(partial_path)
+        headers = dict(self.headers)
+        resume_from = partial_path.stat().st_size if partial_path.is_file() else 0
+        validator = None
+        if resume_from:
+            try:
+                with open(partial_record_path, "r") as file:
+                    validator = json.load(file).get("validator")
+            except (FileNotFoundError, ValueError):
+                pass
+        if resume_from and validator:
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["If-Range"] = validator
+        with requests.get(url, headers=headers, stream=True, timeout=self._TIMEOUT_SECONDS) as response:
+            if response.status_code == 416:
+                partial_path.unlink(missing_ok=True)
+                partial_record_path.unlink(missing_ok=True)
+                return self._download(url, archive_path)
+            response.raise_for_status()
+            append = response.status_code == 206
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            write_json_atomically(partial_record_path, {"validator": validator})
+            with open(partial_path, "ab" if append else "wb") as destination:
+                for chunk in response.iter_content(self._CHUNK_SIZE):
+                    destination.write(chunk)
+        digest = self._digest(partial_path)
+        partial_path.rename(archive_path)
+        partial_record_path.unlink(missing_ok=True)
+        write_json_atomically(self._record_path(archive_path), {"url": url, "size": archive_path.stat().st_size, "sha256": digest})
+        return None
+
+    def _prune(self) -> None:
+        """
+        Deletes all but the most recently used archives.
+        """
+        records = [path for path in self.folder.glob("*.json") if not path.name.endswith(".part.json")]
+        records.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for record_path in records[self._KEEP_ARCHIVES:]:
+            archive_path = record_path.with_suffix("")
+            with self._lock(archive_path):
+                archive_path.unlink(missing_ok=True)
+                record_path.unlink(missing_ok=True)
+            archive_path.with_name(f"{archive_path.name}.lock").unlink(missing_ok=True)
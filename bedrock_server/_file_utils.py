@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+import fcntl
+import json
+import os
+import threading
+
+
+@contextmanager
+def file_lock(lock_path: Path, blocking: bool = True) -> Iterator[None]:
+    """
+    Holds an exclusive lock on the lock file, shared between processes and threads alike.
+    :raises BlockingIOError: If not blocking and another holder has the lock.
+    """
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomically(path: Path, content: str) -> None:
+    """
+    Writes the file through a temporary file of its own, then renames it into place, so readers never see it half
+    written and concurrent writers never rename each other's temporary file.
+    """
+    partial_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        with open(partial_path, "w") as file:
+            file.write(content)
+        os.replace(partial_path, path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+
+
+def write_json_atomically(path: Path, data: Any) -> None:
+    write_atomically(path, json.dumps(data))
@@ -0,0 +1,86 @@
+from pathlib import Path
+from time import time
+from ._file_utils import file_lock, write_json_atomically
+import json
+import requests
+
+
+class LinksCache:
+    """
+    On-disk cache of the download links API response, shared by every server on the host.
+    Stale entries are revalidated with ETag/If-Modified-Since, and the cached response is used when the API is slow
+    or unreachable.
+    """
+
+    _TIMEOUT_SECONDS = 10
+    _STALE_TIMEOUT_SECONDS = 3
+
+    def __init__(self, path: Path, url: str, headers: dict[str, str], ttl_seconds: float, offline: bool = False) -> None:
+        """
+        :param ttl_seconds: How long a cached response is used without asking the API again.
+        :param offline: Never ask the API, only use the cached response.
+        """
+        self.path = path
+        self.url = url
+        self.headers = headers
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+
+    def _read(self) -> dict | None:
+        try:
+            with open(self.path, "r") as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if entry.get("url") == self.url else None
+
+    def _write(self, entry: dict) -> None:
+        write_json_atomically(self.path, entry)
+
+    def get(self) -> dict:
+        """
+        :return: Parsed links API response
+        :raises TimeoutError: If the request times out and nothing is cached.
+        :raises ConnectionError: If the request is unsuccessful and nothing is cached, or in offline mode with nothing cached.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+            return self._get_locked()
+
+    def _get_locked(self) -> dict:
+        entry = self._read()
+        if entry is not None and (self.offline or time() - entry["fetched_at"] < self.ttl_seconds):
+            return entry["data"]
+        if self.offline:
+            raise ConnectionError("No cached download links available in offline mode.")
+        headers = dict(self.headers)
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        timeout = self._TIMEOUT_SECONDS if entry is None else self._STALE_TIMEOUT_SECONDS
+        try:
+            response = requests.get(self.url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and entry is not None:
+                entry["fetched_at"] = time()
+                self._write(entry)
+                return entry["data"]
+            response.raise_for_status()
+            data: dict = response.json()
+        except requests.Timeout:
+            if entry is not None:
+                return entry["data"]
+            raise TimeoutError("Request for download links timed out.")
+        except (requests.HTTPError, requests.ConnectionError, ValueError):
+            if entry is not None:
+                return entry["data"]
+            raise ConnectionError("Request for download links unsuccessful.")
+        self._write({
+            "url": self.url,
+            "fetched_at": time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "data": data
+        })
+        return data
@@ -0,0 +1,248 @@
+from functools import wraps
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Callable, NamedTuple
+from ._file_utils import file_lock, write_atomically, write_json_atomically
+import atexit
+import json
+import os
+import threading
+
+
+class ProcessSample(NamedTuple):
+    pid: int
+    cpu_seconds: float
+    rss_bytes: int
+    threads: int
+    open_fds: int
+    # None if /proc/<pid>/io is not readable
+    read_bytes: int | None
+    write_bytes: int | None
+
+
+class OperationTiming(NamedTuple):
+    count: int
+    total_seconds: float
+    last_seconds: float
+    max_seconds: float
+
+
+def find_process(executable_path: Path) -> int | None:
+    """
+    :return: PID of the process running the executable, or None if there is none
+    """
+    executable_path = executable_path.resolve()
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            if Path(os.readlink(f"/proc/{entry.name}/exe")) == executable_path:
+                return int(entry.name)
+        except OSError:
+            continue
+    return None
+
+
+def sample_process(pid: int) -> ProcessSample | None:
+    """
+    :return: Resource usage of the process from /proc, or None if it has exited
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            stat_fields = file.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm", "r") as file:
+            resident_pages = int(file.read().split()[1])
+        open_fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    except PermissionError:
+        open_fds = 0
+    read_bytes = write_bytes = None
+    try:
+        with open(f"/proc/{pid}/io", "r") as file:
+            io = dict(line.split(": ", 1) for line in file.read().splitlines())
+        read_bytes, write_bytes = int(io["read_bytes"]), int(io["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        pass
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    return ProcessSample(
+        pid,
+        (int(stat_fields[11]) + int(stat_fields[12])) / clock_ticks,
+        resident_pages * os.sysconf("SC_PAGE_SIZE"),
+        int(stat_fields[17]),
+        open_fds,
+        read_bytes,
+        write_bytes
+    )
+
+
+def directory_size(path: Path) -> int:
+    """
+    :return: Total size in bytes of the files under the directory, counting hardlinked files once
+    """
+    total = 0
+    seen = set()
+    pending = [path]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    total += stat.st_size
+    return total
+
+
+class OperationTimings:
+    """
+    Host-wide record of how long wrapper operations take, per server and operation.
+
+    Timings are gathered in memory and merged into the file at most once a minute and when the process exits, so timing
+    frequent operations like player queries costs no file I/O.
+    """
+
+    FLUSH_INTERVAL_SECONDS = 60.0
+    # Timings of this process not yet merged into each file, and when each file was last merged into
+    _pending: dict[Path, dict[str, dict[str, list[float]]]] = {}
+    _flushed_at: dict[Path, float] = {}
+    _pending_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @staticmethod
+    def _merge(timings: dict[str, dict[str, list[float]]], server_name: str, operation: str, timing: list[float]) -> None:
+        count, total, last, maximum = timing
+        previous_count, previous_total, _, previous_maximum = timings.setdefault(server_name, {}).get(operation, [0, 0.0, 0.0, 0.0])
+        timings[server_name][operation] = [previous_count + count, previous_total + total, last, max(previous_maximum, maximum)]
+
+    def _read(self) -> dict[str, dict[str, list[float]]]:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def read(self) -> dict[str, dict[str, OperationTiming]]:
+        """
+        :return: Timings from the file, including those of this process not merged into it yet
+        """
+        timings = self._read()
+        with self._pending_lock:
+            for server_name, operations in self._pending.get(self.path, {}).items():
+                for operation, timing in operations.items():
+                    self._merge(timings, server_name, operation, timing)
+        return {
+            server_name: {operation: OperationTiming(*timing) for operation, timing in operations.items()}
+            for server_name, operations in timings.items()
+        }
+
+    def record(self, server_name: str, operation: str, seconds: float) -> None:
+        with self._pending_lock:
+            if not self._flushed_at:
+                atexit.register(OperationTimings.flush_all)
+            self._merge(self._pending.setdefault(self.path, {}), server_name, operation, [1, seconds, seconds, seconds])
+            flush_due = monotonic() - self._flushed_at.setdefault(self.path, monotonic()) >= self.FLUSH_INTERVAL_SECONDS
+        if flush_due:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Merges the timings of this process into the file.
+        """
+        with self._pending_lock:
+            pending = self._pending.pop(self.path, None)
+            self._flushed_at[self.path] = monotonic()
+        if not pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+            timings = self._read()
+            for server_name, operations in pending.items():
+                for operation, timing in operations.items():
+                    self._merge(timings, server_name, operation, timing)
+            write_json_atomically(self.path, timings)
+
+    @classmethod
+    def flush_all(cls) -> None:
+        for path in list(cls._pending):
+            cls(path).flush()
+
+
+def timed(operation: str) -> Callable:
+    """
+    Records how long each call of a BedrockServer method takes, whether or not it succeeds.
+    """
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._operation_timings().record(self.server_name, operation, perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def write_textfile(path: Path, content: str) -> None:
+    """
+    Writes the file atomically, so a metrics collector never reads it half written.
+    """
+    write_atomically(path, content)
+
+
+class ServerMetrics(NamedTuple):
+    name: str
+    # None if the server is not running
+    process: ProcessSample | None
+    world_bytes: int
+    backups_bytes: int
+    timings: dict[str, OperationTiming]
+
+
+def render_prometheus(metrics: list[ServerMetrics]) -> str:
+    """
+    :return: Metrics in the Prometheus text exposition format
+    """
+    server_series: list[tuple[str, str, str, Callable[[ServerMetrics], float | None]]] = [
+        ("bsw_server_up", "gauge", "Whether the server process is running.", lambda server: int(server.process is not None)),
+        ("bsw_process_cpu_seconds_total", "counter", "CPU time used by the server process.",
+         lambda server: server.process and server.process.cpu_seconds),
+        ("bsw_process_resident_memory_bytes", "gauge", "Resident memory of the server process.",
+         lambda server: server.process and server.process.rss_bytes),
+        ("bsw_process_threads", "gauge", "Threads of the server process.", lambda server: server.process and server.process.threads),
+        ("bsw_process_open_fds", "gauge", "Open file descriptors of the server process.",
+         lambda server: server.process and server.process.open_fds),
+        ("bsw_process_read_bytes_total", "counter", "Bytes the server process read from storage.",
+         lambda server: server.process and server.process.read_bytes),
+        ("bsw_process_write_bytes_total", "counter", "Bytes the server process wrote to storage.",
+         lambda server: server.process and server.process.write_bytes),
+        ("bsw_world_size_bytes", "gauge", "Size of the server's worlds folder.", lambda server: server.world_bytes),
+        ("bsw_backups_size_bytes", "gauge", "Size of the server's backups folder.", lambda server: server.backups_bytes)
+    ]
+    lines = []
+    for name, metric_type, help_text, value_of in server_series:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        for server in metrics:
+            value = value_of(server)
+            if value is not None:
+                lines.append(f"{name}{{server=\"{server.name}\"}} {value}")
+    timing_series = [
+        ("bsw_operation_duration_seconds_sum", "counter", "Total time spent in the wrapper operation.", "total_seconds"),
+        ("bsw_operation_duration_seconds_count", "counter", "Number of times the wrapper operation ran.", "count"),
+        ("bsw_operation_last_duration_seconds", "gauge", "Duration of the latest run of the wrapper operation.", "last_seconds"),
+        ("bsw_operation_max_duration_seconds", "gauge", "Longest run of the wrapper operation.", "max_seconds")
+    ]
+    for name, metric_type, help_text, field in timing_series:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        for server in metrics:
+            for operation, timing in sorted(server.timings.items()):
+                lines.append(f"{name}{{server=\"{server.name}\",operation=\"{operation}\"}} {getattr(timing, field)}")
+    return "\n".join(lines) + "\n"
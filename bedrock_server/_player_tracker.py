@@ -0,0 +1,106 @@
+from contextlib import AbstractContextManager
+from pathlib import Path
+from ._file_utils import file_lock, write_json_atomically
+import json
+import os
+import re
+
+
+class PlayerTracker:
+    """
+    Keeps track of online players by incrementally reading the server's console log from where it last stopped,
+    following join and leave lines and the output of the list command.
+    """
+
+    _CONNECTED_PATTERN = re.compile(r"Player connected: (.+?), xuid:")
+    _DISCONNECTED_PATTERN = re.compile(r"Player disconnected: (.+?), xuid:")
+    _LIST_PATTERN = re.compile(r"There (?:are|is) (\d+)/\d+ players? online:")
+    _PREFIX_PATTERN = re.compile(r"^\[[^\]]*\]\s*")
+
+    def __init__(self, log_path: Path, state_path: Path) -> None:
+        self.log_path = log_path
+        self.state_path = state_path
+        self._state = self._read_state()
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self.state_path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"inode": None, "offset": 0, "players": [], "synced": False}
+
+    def _write_state(self) -> None:
+        write_json_atomically(self.state_path, self._state)
+
+    def _lock(self) -> AbstractContextManager[None]:
+        return file_lock(self.state_path.with_name(f"{self.state_path.name}.lock"))
+
+    def reset(self, synced: bool) -> None:
+        """
+        :param synced: Whether the log is known to start with the session, so its join and leave lines are complete.
+        """
+        try:
+            inode = self.log_path.stat().st_ino
+            offset = 0 if synced else self.log_path.stat().st_size
+        except FileNotFoundError:
+            inode, offset = None, 0
+        with self._lock():
+            self._state = {"inode": inode, "offset": offset, "players": [], "synced": synced}
+            self._write_state()
+
+    @property
+    def synced(self) -> bool:
+        return self._state["synced"]
+
+    @property
+    def players(self) -> list[str]:
+        return list(self._state["players"])
+
+    def update(self) -> None:
+        """
+        Reads complete console lines added since the last update and applies them to the player state.
+        """
+        try:
+            stat = self.log_path.stat()
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._state["inode"] and stat.st_size == self._state["offset"]:
+            return
+        # Another process may have moved the state on since it was read, so read it again under the lock
+        with self._lock():
+            self._state = self._read_state()
+            self._update(stat)
+
+    def _update(self, stat: os.stat_result) -> None:
+        if stat.st_ino != self._state["inode"] or stat.st_size < self._state["offset"]:
+            self._state = {"inode": stat.st_ino, "offset": 0, "players": [], "synced": True}
+        if stat.st_size == self._state["offset"]:
+            return
+        with open(self.log_path, "rb") as log:
+            log.seek(self._state["offset"])
+            content = log.read(stat.st_size - self._state["offset"])
+        lines = [self._PREFIX_PATTERN.sub("", line.strip()) for line in content.decode(errors="ignore").split("\n")]
+        # The last piece is an incomplete line or empty, and is read again next time
+        complete_length = content.rfind(b"\n") + 1
+        lines.pop()
+        # Names follow the list header on the next line, so a header without it yet is read again together with it
+        if lines and (match := self._LIST_PATTERN.search(lines[-1])) and int(match.group(1)):
+            complete_length = content.rfind(b"\n", 0, complete_length - 1) + 1
+            lines.pop()
+        if not lines:
+            return
+        self._state["offset"] += complete_length
+        players = dict.fromkeys(self._state["players"])
+        for index, line in enumerate(lines):
+            if match := self._CONNECTED_PATTERN.search(line):
+                players[match.group(1)] = None
+            elif match := self._DISCONNECTED_PATTERN.search(line):
+                players.pop(match.group(1), None)
+            elif match := self._LIST_PATTERN.search(line):
+                names_line = lines[index + 1] if index + 1 < len(lines) else ""
+                names = [name.strip() for name in names_line.split(",") if name.strip()]
+                if int(match.group(1)) == len(names):
+                    players = dict.fromkeys(names)
+                    self._state["synced"] = True
+        self._state["players"] = list(players)
+        self._write_state()
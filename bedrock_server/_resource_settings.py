@@ -0,0 +1,164 @@
+from pathlib import Path
+from shutil import which
+from subprocess import run
+from typing import NamedTuple
+import os
+
+
+DEFAULT_SETTINGS_FILE = """\
+# Wrapper settings for this server. Resource settings apply each time it starts.
+
+# CPUs to run on: "none" for any, "auto" to spread automatic servers across NUMA nodes and cores, or a list like 0-3,8
+cpu-affinity=none
+# With auto affinity, how many CPUs each server gets, or 0 for a whole NUMA node
+cpu-cores=0
+# Niceness from 0 to 19, higher being lower priority
+nice=0
+# I/O scheduling class: none, realtime (root only), best-effort or idle, with a priority from 0 (highest) to 7
+io-class=none
+io-priority=4
+# cgroup v2 limits, only applied where systemd-run, cgroup v2 and a systemd user manager are available: memory like 4G, and CPU time in cores like 2.5
+memory-max=
+cpu-max=
+
+# Maintenance run by the scheduler (bsw scheduler). Intervals are in minutes, with 0 turning the job off.
+backup-interval=0
+# Back up without stopping the server, and as a deduplicated snapshot instead of a zip archive
+backup-online=true
+backup-incremental=false
+# Number of newest backups to keep
+backup-keep=30
+# Daily window to restart in and apply updates, like 04:00-05:00 in local time, or empty for no scheduled restarts
+restart-window=
+# How often to check for a new version, updating a stopped server right away and a running one at its next restart
+update-interval=0
+# Minutes a due backup or restart waits for players to leave before going ahead anyway, or 0 to always wait
+max-defer=0
+# Seconds to count down in chat before stopping a server with players online
+restart-countdown=60
+"""
+
+
+class ResourceSettings(NamedTuple):
+    cpu_affinity: str = "none"
+    cpu_cores: int = 0
+    nice: int = 0
+    io_class: str = "none"
+    io_priority: int = 4
+    memory_max: str = ""
+    cpu_max: float = 0.0
+
+    IO_CLASSES = {"none": 0, "realtime": 1, "best-effort": 2, "idle": 3}
+
+    @classmethod
+    def from_properties(cls, properties: dict[str, str]) -> "ResourceSettings":
+        """
+        :raises ValueError: If a setting is invalid.
+        """
+        defaults = cls()
+        try:
+            settings = cls(
+                properties.get("cpu-affinity", defaults.cpu_affinity) or defaults.cpu_affinity,
+                int(properties.get("cpu-cores") or defaults.cpu_cores),
+                int(properties.get("nice") or defaults.nice),
+                properties.get("io-class", defaults.io_class) or defaults.io_class,
+                int(properties.get("io-priority") or defaults.io_priority),
+                properties.get("memory-max", defaults.memory_max),
+                float(properties.get("cpu-max") or defaults.cpu_max)
+            )
+        except ValueError:
+            raise ValueError("Resource settings must be whole numbers, except cpu-max.")
+        if settings.cpu_affinity not in ("none", "auto"):
+            parse_cpu_list(settings.cpu_affinity)
+        if settings.cpu_cores < 0 or settings.cpu_max < 0:
+            raise ValueError("cpu-cores and cpu-max cannot be negative.")
+        if not 0 <= settings.nice <= 19:
+            raise ValueError("nice must be between 0 and 19.")
+        if settings.io_class not in cls.IO_CLASSES:
+            raise ValueError(f"io-class must be one of: {', '.join(cls.IO_CLASSES)}")
+        # ionice refuses the realtime class to other users, and then does not run the server at all
+        if settings.io_class == "realtime" and os.geteuid() != 0:
+            raise ValueError("io-class realtime needs root. Use best-effort with a low io-priority instead.")
+        if not 0 <= settings.io_priority <= 7:
+            raise ValueError("io-priority must be between 0 and 7.")
+        return settings
+
+    def launch_prefix(self, cpus: list[int] | None) -> list[str]:
+        """
+        :param cpus: CPUs to pin the server to, or None for any.
+        :return: Command to run the server through so these settings apply to it
+        """
+        prefix = []
+        properties = []
+        if self.memory_max:
+            properties += ["-p", f"MemoryMax={self.memory_max}"]
+        if self.cpu_max:
+            properties += ["-p", f"CPUQuota={round(self.cpu_max * 100)}%"]
+        if properties and cgroups_available():
+            prefix += ["systemd-run", "--user", "--scope", "--quiet", *properties, "--"]
+        if cpus:
+            prefix += ["taskset", "-c", format_cpu_list(cpus)]
+        if self.nice:
+            prefix += ["nice", "-n", str(self.nice)]
+        if self.io_class != "none":
+            prefix += ["ionice", "-c", str(self.IO_CLASSES[self.io_class])]
+            if self.io_class != "idle":
+                prefix += ["-n", str(self.io_priority)]
+        return prefix
+
+
+def cgroups_available() -> bool:
+    """
+    :return: Whether systemd-run can put the server in a scope of its own, which needs cgroup v2 and a reachable user
+        manager, as there is none under cron or a session without a login
+    """
+    if not Path("/sys/fs/cgroup/cgroup.controllers").is_file() or which("systemd-run") is None or which("systemctl") is None:
+        return False
+    return run(["systemctl", "--user", "show-environment"], capture_output=True).returncode == 0
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """
+    :param cpu_list: CPU list in the kernel's format, like "0-3,8".
+    :raises ValueError: If the list is malformed.
+    """
+    cpus = []
+    try:
+        for part in cpu_list.strip().split(","):
+            first, _, last = part.partition("-")
+            cpus.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise ValueError(f"CPU list is invalid: {cpu_list}")
+    return cpus
+
+
+def format_cpu_list(cpus: list[int]) -> str:
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+def numa_nodes() -> list[list[int]]:
+    """
+    :return: CPUs this process may use, grouped by NUMA node, with one group for all of them if there is no NUMA info
+    """
+    usable = os.sched_getaffinity(0)
+    nodes = []
+    for cpulist_path in sorted(Path("/sys/devices/system/node").glob("node*/cpulist"), key=lambda path: int(path.parent.name[4:])):
+        cpu_list = cpulist_path.read_text().strip()
+        cpus = [cpu for cpu in parse_cpu_list(cpu_list) if cpu in usable] if cpu_list else []
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [sorted(usable)]
+
+
+def spread_cpus(index: int, cores: int, nodes: list[list[int]]) -> list[int]:
+    """
+    Places the servers with automatic affinity round-robin across NUMA nodes, then gives each server on a node the
+    next slice of that node's CPUs, wrapping around once a node is full.
+    :param index: Position of the server among the servers with automatic affinity.
+    :param cores: CPUs for each server, or 0 for the whole node.
+    """
+    node = nodes[index % len(nodes)]
+    if not cores or cores >= len(node):
+        return node
+    start = (index // len(nodes)) * cores % len(node)
+    return [node[(start + offset) % len(node)] for offset in range(cores)]
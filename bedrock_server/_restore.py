@@ -0,0 +1,172 @@
+from hashlib import sha256
+from pathlib import Path, PurePosixPath
+from typing import Iterable
+from ._file_utils import write_json_atomically
+import json
+import os
+import zlib
+
+
+class BackupIndex:
+    """
+    Sidecar index of a backup, written next to it at backup time, so backups can be listed and restores planned
+    without opening the archive. Each member maps to its size and checksum: CRC-32 for archives, SHA-256 for snapshots.
+    """
+
+    SUFFIX = ".index.json"
+
+    _CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, archive_format: str, members: dict[str, list], checksum: str = "crc32") -> None:
+        """
+        :param members: Member names mapped to their size and checksum, with None as the checksum if unknown.
+        """
+        self.archive_format = archive_format
+        self.members = members
+        self.checksum = checksum
+
+    @property
+    def worlds(self) -> list[str]:
+        return sorted({name.split("/")[1] for name in self.members if name.startswith("worlds/") and name.count("/") > 1})
+
+    @property
+    def size(self) -> int:
+        return sum(size for size, _ in self.members.values())
+
+    @staticmethod
+    def path_for(backup_path: Path) -> Path:
+        return backup_path.with_name(f"{backup_path.name.split('.', 1)[0]}{BackupIndex.SUFFIX}")
+
+    def write(self, path: Path) -> None:
+        write_json_atomically(path, {"format": self.archive_format, "checksum": self.checksum, "worlds": self.worlds, "members": self.members})
+
+    @classmethod
+    def read(cls, path: Path) -> "BackupIndex":
+        with open(path, "r") as file:
+            index = json.load(file)
+        return cls(index["format"], index["members"], index["checksum"])
+
+    @classmethod
+    def from_zip(cls, path: Path) -> "BackupIndex":
+        """
+        Builds the index of a zip backup made before indexes were written, from its central directory.
+        """
+        from zipfile import ZipFile
+        with ZipFile(path) as archive:
+            return cls("zip", {info.filename: [info.file_size, info.CRC] for info in archive.infolist() if not info.is_dir()})
+
+    @classmethod
+    def from_snapshot(cls, manifest: dict) -> "BackupIndex":
+        return cls("snapshot", {name: [file["size"], file["sha256"]] for name, file in manifest["files"].items()}, "sha256")
+
+    def live_checksum(self, path: Path) -> int | str:
+        if self.checksum == "sha256":
+            hasher = sha256()
+            with open(path, "rb") as file:
+                while chunk := file.read(self._CHUNK_SIZE):
+                    hasher.update(chunk)
+            return hasher.hexdigest()
+        crc = 0
+        with open(path, "rb") as file:
+            while chunk := file.read(self._CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+        return crc
+
+
+class RestorePlan:
+    """
+    Members of a backup that differ from the live server files, and live files to delete, for the selected parts.
+    """
+
+    def __init__(self, extract: list[str], remove: list[str], unchanged: int) -> None:
+        self.extract = extract
+        self.remove = remove
+        self.unchanged = unchanged
+
+    @classmethod
+    def create(
+            cls,
+            index: BackupIndex,
+            target: Path,
+            worlds: Iterable[str] | None = None,
+            config_files: Iterable[str] | None = None,
+            config_dirs: Iterable[str] | None = None,
+            paths: Iterable[str] | None = None
+    ) -> "RestorePlan":
+        """
+        With no selection everything in the backup is restored. Files not in the backup are deleted from selected
+        worlds and paths, so they match the backup exactly, but never from configs.
+        :param worlds: World folder names to restore.
+        :param config_files: Top-level config file names to restore.
+        :param config_dirs: Top-level config folder names to restore.
+        :param paths: Path prefixes, relative to the server folder, to restore.
+        :raises ValueError: If a world is not a plain folder name, or a path leads outside the server folder.
+        """
+        for world in worlds or []:
+            if not cls._stays_inside(world) or len(PurePosixPath(world).parts) != 1:
+                raise ValueError(f"World name is invalid: {world}")
+        for path in paths or []:
+            if not cls._stays_inside(path):
+                raise ValueError(f"Path must be inside the server folder: {path}")
+        exact_prefixes = [f"worlds/{world}/" for world in worlds or []] + [path.strip("/") for path in paths or []]
+        config_files = set(config_files or [])
+        config_prefixes = [f"{folder}/" for folder in config_dirs or []]
+        select_all = not exact_prefixes and not config_files and not config_prefixes
+
+        def selected(name: str) -> bool:
+            return (select_all or name in config_files or any(name.startswith(prefix) for prefix in config_prefixes)
+                    or any(name == prefix or name.startswith(f"{prefix.rstrip('/')}/") for prefix in exact_prefixes))
+
+        extract = []
+        unchanged = 0
+        for name, (size, checksum) in index.members.items():
+            if not selected(name) or not cls._stays_inside(name):
+                continue
+            live_path = target.joinpath(name)
+            if checksum is not None and live_path.is_file() and live_path.stat().st_size == size and index.live_checksum(live_path) == checksum:
+                unchanged += 1
+                continue
+            extract.append(name)
+        remove = []
+        for prefix in exact_prefixes:
+            live_root = target.joinpath(prefix)
+            if not live_root.is_dir():
+                continue
+            for live_path in live_root.rglob("*"):
+                name = live_path.relative_to(target).as_posix()
+                if live_path.is_file() and name not in index.members:
+                    remove.append(name)
+        return cls(extract, remove, unchanged)
+
+    @staticmethod
+    def _stays_inside(name: str) -> bool:
+        """
+        :return: Whether the relative path names something inside the folder it is relative to, and not the folder itself
+        """
+        path = PurePosixPath(name)
+        return bool(path.parts) and not path.is_absolute() and ".." not in path.parts
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.extract and not self.remove
+
+    def apply(self, target: Path, members: Iterable[tuple[str, Iterable[bytes]]], executable_name: str) -> None:
+        """
+        Writes every member next to its live file and renames it into place, so files hard linked from the version
+        store are replaced rather than written through, then deletes the files to remove.
+        :param members: Name and content chunks of every member to extract.
+        """
+        for name, chunks in members:
+            live_path = target.joinpath(name)
+            live_path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path = live_path.with_name(f"{live_path.name}.part")
+            with open(partial_path, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            if name == executable_name:
+                partial_path.chmod(0o755)
+            elif live_path.exists():
+                partial_path.chmod(live_path.stat().st_mode & 0o777 | 0o600)
+            os.replace(partial_path, live_path)
+        for name in self.remove:
+            target.joinpath(name).unlink(missing_ok=True)
@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import sleep, time
+from typing import Callable, NamedTuple, TYPE_CHECKING
+import json
+
+from ._archive_writer import ArchiveWriter
+from ._file_utils import file_lock, write_json_atomically
+
+if TYPE_CHECKING:
+    from ._server import BedrockServer
+
+
+class MaintenancePolicy(NamedTuple):
+    backup_interval: int = 0
+    backup_online: bool = True
+    backup_incremental: bool = False
+    backup_keep: int = 30
+    restart_window: str = ""
+    update_interval: int = 0
+    max_defer: int = 0
+    restart_countdown: int = 60
+
+    @classmethod
+    def from_properties(cls, properties: dict[str, str]) -> "MaintenancePolicy":
+        """
+        :raises ValueError: If a setting is invalid.
+        """
+        defaults = cls()
+        for key in ("backup-online", "backup-incremental"):
+            if properties.get(key, "") not in ("", "true", "false"):
+                raise ValueError(f"{key} must be true or false.")
+        try:
+            policy = cls(
+                int(properties.get("backup-interval") or defaults.backup_interval),
+                properties.get("backup-online", "") != "false",
+                properties.get("backup-incremental", "") == "true",
+                int(properties.get("backup-keep") or defaults.backup_keep),
+                properties.get("restart-window", defaults.restart_window),
+                int(properties.get("update-interval") or defaults.update_interval),
+                int(properties.get("max-defer") or defaults.max_defer),
+                int(properties.get("restart-countdown") or defaults.restart_countdown)
+            )
+        except ValueError:
+            raise ValueError("Maintenance intervals, counts and delays must be whole numbers.")
+        if min(policy.backup_interval, policy.update_interval, policy.max_defer, policy.restart_countdown) < 0:
+            raise ValueError("Maintenance intervals and delays cannot be negative.")
+        if policy.backup_keep < 1:
+            raise ValueError("backup-keep must be at least 1.")
+        policy.restart_window_minutes()
+        return policy
+
+    def restart_window_minutes(self) -> tuple[int, int] | None:
+        """
+        :return: Minutes after midnight the daily restart window starts at and its length in minutes, or None if there is no window
+        :raises ValueError: If the window is not like 04:00-05:00.
+        """
+        if not self.restart_window:
+            return None
+        try:
+            start, end = (datetime.strptime(part.strip(), "%H:%M") for part in self.restart_window.split("-"))
+        except ValueError:
+            raise ValueError(f"restart-window must be like 04:00-05:00, not: {self.restart_window}")
+        start_minutes = start.hour * 60 + start.minute
+        length = (end.hour * 60 + end.minute - start_minutes) % (24 * 60)
+        return start_minutes, length or 24 * 60
+
+    def enabled(self, job: str) -> bool:
+        if job == "backup":
+            return self.backup_interval > 0
+        if job == "restart":
+            return bool(self.restart_window)
+        return self.update_interval > 0
+
+
+def next_slot(after: float, interval_seconds: float, offset_seconds: float) -> float:
+    """
+    :return: First time after the given one that is a whole number of intervals past the offset
+    """
+    return offset_seconds + ((after - offset_seconds) // interval_seconds + 1) * interval_seconds
+
+
+class Scheduler:
+    """
+    Runs the maintenance jobs each server's bsw.properties asks for: backups every so often, a restart within a daily
+    window and checks for new server versions.
+
+    The servers sharing a job get evenly spaced slots within its interval or window, and jobs run one at a time, so
+    disk and CPU heavy work is spread out instead of hitting every server at the same minute. A backup or restart that
+    comes due while players are online waits for them to leave, up to the policy's limit, and a restart that is still
+    waiting when its window closes is skipped until the next day. When each job last ran is kept in a state file, so
+    the schedule carries on where it left off after the scheduler restarts.
+    """
+
+    JOBS = ("backup", "restart", "update")
+    POLL_INTERVAL_SECONDS = 30.0
+    STATE_FILE_NAME = "state.json"
+    # Reported in place of a server name for failures that concern no one server, and can never be a server's name
+    SCHEDULER_NAME = "(scheduler)"
+
+    def __init__(self, folder: Path, report: Callable[[str, str], None]) -> None:
+        """
+        :param folder: Folder for the state and lock files.
+        :param report: Called with a server name and a message whenever a job runs, waits or fails.
+        """
+        self.folder = folder
+        self._report = report
+        # Server names mapped to job names mapped to when the job last ran, or was first seen, and since when it waits
+        self._state: dict[str, dict[str, dict[str, float]]] = {}
+        self._errors: dict[str, str] = {}
+
+    @property
+    def _state_path(self) -> Path:
+        return self.folder.joinpath(self.STATE_FILE_NAME)
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self._state_path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_state(self) -> None:
+        write_json_atomically(self._state_path, self._state)
+
+    def run(self) -> None:
+        """
+        Runs jobs as they come due, until interrupted.
+        :raises RuntimeError: If another scheduler is already running.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        try:
+            with file_lock(self.folder.joinpath("lock"), blocking=False):
+                self._state = self._read_state()
+                while True:
+                    next_due = self.run_due_jobs()
+                    sleep(max(1.0, min(next_due, time() + self.POLL_INTERVAL_SECONDS) - time()))
+        except BlockingIOError:
+            raise RuntimeError("Scheduler is already running.")
+
+    def run_due_jobs(self) -> float:
+        """
+        Runs every job that is due, one after another. If the servers cannot be found or read, that is reported and
+        tried again at the next poll.
+        :return: When the next job is due
+        """
+        from ._server import BedrockServer
+        try:
+            server_names = sorted(BedrockServer.list_servers())
+            online = set(BedrockServer.list_online_servers())
+        except Exception as error:
+            self._report_error(self.SCHEDULER_NAME, f"Finding servers failed: {type(error).__name__}: {error}")
+            return time() + self.POLL_INTERVAL_SECONDS
+        self._errors.pop(self.SCHEDULER_NAME, None)
+        policies: dict[str, tuple[BedrockServer, MaintenancePolicy]] = {}
+        for server_name in server_names:
+            try:
+                server = BedrockServer.load(server_name)
+                if isinstance(server, str):
+                    continue
+                policies[server_name] = server, server._maintenance_policy
+            except ValueError as error:
+                self._report_error(server_name, f"Maintenance settings are invalid: {error}")
+            except Exception as error:
+                self._report_error(server_name, f"Reading the server failed: {type(error).__name__}: {error}")
+            else:
+                self._errors.pop(server_name, None)
+        next_due = float("inf")
+        for job in self.JOBS:
+            sharing = [server_name for server_name, (_, policy) in policies.items() if policy.enabled(job)]
+            for index, server_name in enumerate(sharing):
+                server, policy = policies[server_name]
+                job_state = self._state.setdefault(server_name, {}).setdefault(job, {})
+                if "last_run" not in job_state:
+                    job_state["last_run"] = time()
+                    self._write_state()
+                due = self._due_time(job, server_name, policy, index / len(sharing), job_state)
+                if due <= time():
+                    due = self._run_job(job, server, policy, server_name in online, job_state)
+                next_due = min(next_due, due)
+        return next_due
+
+    def _report_error(self, server_name: str, message: str) -> None:
+        if self._errors.get(server_name) != message:
+            self._errors[server_name] = message
+            self._report(server_name, message)
+
+    def _due_time(self, job: str, server_name: str, policy: MaintenancePolicy, position: float, job_state: dict[str, float]) -> float:
+        """
+        :param position: Where the server's slot lies within the interval or window, from 0 up to 1.
+        """
+        if job != "restart":
+            interval_seconds = (policy.backup_interval if job == "backup" else policy.update_interval) * 60.0
+            return next_slot(job_state["last_run"], interval_seconds, interval_seconds * position)
+        start_minutes, length = policy.restart_window_minutes()
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        for days in (-1, 0, 1):
+            window_start = midnight + timedelta(days=days, minutes=start_minutes)
+            slot = (window_start + timedelta(minutes=length * position)).timestamp()
+            window_end = (window_start + timedelta(minutes=length)).timestamp()
+            if slot > job_state["last_run"] and window_end > time():
+                if job_state.get("deferred_since", slot) < window_start.timestamp():
+                    del job_state["deferred_since"]
+                    self._write_state()
+                    self._report(server_name, "Restart skipped until the next window as players stayed online.")
+                return slot
+        return (midnight + timedelta(days=2, minutes=start_minutes)).timestamp()
+
+    def _run_job(self, job: str, server: "BedrockServer", policy: MaintenancePolicy, running: bool, job_state: dict[str, float]) -> float:
+        """
+        Runs the job unless it has to wait for players. Whatever goes wrong is reported for the server, and the job
+        is tried again at its next slot, so one server's failure never stops the scheduler.
+        :return: When to check on the job again
+        """
+        try:
+            players = server.get_player_count() if running and job != "update" else 0
+            if players:
+                if "deferred_since" not in job_state:
+                    job_state["deferred_since"] = time()
+                    self._write_state()
+                    if players < 0:
+                        self._report(server.server_name, f"Waiting before the {job}, as the player count cannot be determined.")
+                    else:
+                        self._report(server.server_name, f"Waiting for {players} online players to leave before the {job}.")
+                if not policy.max_defer or time() - job_state["deferred_since"] < policy.max_defer * 60:
+                    return time() + self.POLL_INTERVAL_SECONDS
+            # After waiting as long as allowed, go ahead even if players, or possibly players, are online
+            message = getattr(self, f"_{job}")(server, policy, running, players != 0)
+        except server.PlayersOnServerError:
+            return time() + self.POLL_INTERVAL_SECONDS
+        except Exception as error:
+            message = f"The {job} failed: {type(error).__name__}: {error}"
+        job_state["last_run"] = time()
+        job_state.pop("deferred_since", None)
+        self._write_state()
+        if message:
+            self._report(server.server_name, message)
+        return time()
+
+    @staticmethod
+    def _backup(server: "BedrockServer", policy: MaintenancePolicy, running: bool, force: bool) -> str:
+        if force and running and not policy.backup_online:
+            server.count_down([server], policy.restart_countdown, "Server stopping for a backup in {time}.")
+        # Low priority compression, as nobody is waiting on a scheduled backup
+        archive_writer = ArchiveWriter(nice=10)
+        server.backup(0, policy.backup_keep, force, policy.backup_online, policy.backup_incremental, archive_writer)
+        return "Backup created."
+
+    @staticmethod
+    def _restart(server: "BedrockServer", policy: MaintenancePolicy, running: bool, force: bool) -> str:
+        if not running:
+            return ""
+        if force:
+            server.count_down([server], policy.restart_countdown, "Server restarting in {time}.")
+        update_plan = server.restart(force)
+        if update_plan is None:
+            return "Server restarted."
+        return f"Server updated and restarted: {len(update_plan.added)} files added, {len(update_plan.changed)} changed, {len(update_plan.remove)} removed."
+
+    @staticmethod
+    def _update(server: "BedrockServer", policy: MaintenancePolicy, running: bool, force: bool) -> str:
+        """
+        Downloads and installs any new version into the version store. A stopped server is updated right away, and a
+        running one at its next restart.
+        """
+        download_url = server.prepare_update([server])
+        if running:
+            return "" if server._last_update_url == download_url else "New version ready for the next restart."
+        update_plan = server.update(download_url)
+        if update_plan is None:
+            return ""
+        return f"Server updated: {len(update_plan.added)} files added, {len(update_plan.changed)} changed, {len(update_plan.remove)} removed."
@@ -1,15 +1,32 @@
 from datetime import datetime
-from shutil import make_archive
+from shutil import which
 from subprocess import run
 from shutil import rmtree
 from re import sub
 from pathlib import Path
-import requests
-from zipfile import ZipFile
-from io import BytesIO
-from fake_useragent import UserAgent
-from time import sleep
+from time import sleep, monotonic
+from typing import Callable, Iterator, NamedTuple, TYPE_CHECKING
+from ._archive_writer import ArchiveWriter
+from ._backup_catalog import BackupCatalog
+from ._backup_store import BackupStore
+from ._command_queue import CommandQueue
+from ._player_tracker import PlayerTracker
+from ._resource_settings import DEFAULT_SETTINGS_FILE, ResourceSettings, numa_nodes, parse_cpu_list, spread_cpus
+from ._restore import BackupIndex, RestorePlan
+from ._scheduler import MaintenancePolicy, Scheduler
+from ._supervisor_client import SupervisorClient
+from ._metrics import OperationTimings, ServerMetrics, directory_size, find_process, render_prometheus, sample_process, timed, write_textfile
+from urllib.parse import urlparse
+from fnmatch import fnmatchcase
+import os
 import re
+import shlex
+import select
+import signal
+
+# Networking, zip handling and the asyncio supervisor are only imported when used, so that cheap commands start fast
+if TYPE_CHECKING:
+    from ._update_plan import UpdatePlan
 
 
 class BedrockServer:
@@ -18,11 +35,13 @@ class BedrockServer:
     MIN_NAME_LEN = 4
     MAX_NAME_LEN = 32
 
-    # URL and headers for update
+    # URL and headers for update; the user agent is picked on first use, as loading the dataset is slow
     _UPDATE_LINKS_URL = "https://net-secondary.web.minecraft-services.net/api/v1.0/download/links"
-    _USER_AGENT = {
-        "User-Agent": UserAgent(platforms=["desktop"]).random
-    }
+    _USER_AGENT: dict[str, str] | None = None
+
+    # Download links caching; offline only uses cached links and never asks the API
+    links_ttl_seconds: float = 3600
+    offline: bool = False
 
     # Server files and directories to normally exclude from updating and replacing
     _UPDATER_EXCLUDE_FILES = [
@@ -40,10 +59,33 @@ class BedrockServer:
     _DIR = Path.home().joinpath("BSW")
     _BEDROCK_SERVER_PROGRAM_NAME = "bedrock_server"
     _BEDROCK_SERVER_PROPERTIES_FILE_NAME = "server.properties"
-    _DIR.mkdir(parents=True, exist_ok=True)
+    _SETTINGS_FILE_NAME = "bsw.properties"
+    _WORLDS_DIR_NAME = "worlds"
+    _CACHE_DIR_NAME = ".cache"
+    _VERSIONS_DIR_NAME = ".versions"
+    _SUPERVISOR_SOCKET_NAME = ".supervisor.sock"
+    _METRICS_DIR_NAME = ".metrics"
+    _SCHEDULER_DIR_NAME = ".scheduler"
+    _BACKUP_SUFFIXES = (".zip", ".tar.zst", BackupStore.SNAPSHOT_SUFFIX)
+    _BACKUP_CATALOG_FILE_NAME = "catalog.json"
+    _BACKUP_NAME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+    # Parsed server.properties and bsw.properties files, keyed by path and reused while their modification time and size stay the same
+    _SERVER_PROPERTIES_CACHE: dict[Path, tuple[int, int, dict[str, str]]] = {}
+
+    # Online backup timing, for waiting on the server to finish preparing world files
+    _SAVE_QUERY_INTERVAL_SECONDS = 1.0
+    _SAVE_QUERY_TIMEOUT_SECONDS = 60.0
 
-    # Empty dictionary to load server.properties into when ready
-    _SERVER_PROPERTIES: dict[str, str] = {}
+    # How long to wait for a server to exit after the stop command before killing it, and then for it to be gone
+    _STOP_TIMEOUT_SECONDS = 60.0
+    _KILL_TIMEOUT_SECONDS = 5.0
+
+    # Longest text to stuff into a screen session at once, well within what screen accepts for one command
+    _SCREEN_STUFF_LIMIT = 2048
+
+    # How long to wait for the list command when player tracking needs to resync
+    _PLAYER_RESYNC_TIMEOUT_SECONDS = 2.0
 
     # Constructor blocker to allow methods to validate server_name differently
     _CONSTRUCTOR_BLOCKER = object()
@@ -57,6 +99,37 @@ class BedrockServer:
     class PlayersOnServerError(RuntimeError):
         pass
 
+    class RetentionPolicy(NamedTuple):
+        # Newest backups to keep
+        keep_last: int = 30
+        # Newest backup of each of this many recent hours, days and weeks to keep as well
+        hourly: int = 0
+        daily: int = 0
+        weekly: int = 0
+        # Deletes the oldest backups, always keeping the newest, until all backups take up at most this many bytes
+        budget_bytes: int | None = None
+
+    class BackupInfo(NamedTuple):
+        name: str
+        files: int
+        # Uncompressed size in bytes
+        size: int
+        worlds: list[str]
+
+    class BulkResult(NamedTuple):
+        name: str
+        # What the action returned, or None if it raised
+        result: object
+        error: BaseException | None
+
+    class ServerStatus(NamedTuple):
+        name: str
+        port: int
+        port_ipv6: int
+        online: bool
+        # None if offline or unable to determine in time
+        players: int | None
+
     def __init__(self, server_name: str, token: object) -> None:
         """
         :param server_name: Case-insensitive name for the server.
@@ -79,9 +152,12 @@ class BedrockServer:
 
     @classmethod
     def load(cls, server_name: str) -> "BedrockServer | str":
-        if not server_name in cls.list_servers():
+        if not cls._validate_name(server_name):
             return "Server does not exist."
-        return cls(server_name, cls._CONSTRUCTOR_BLOCKER)
+        server = cls(server_name, cls._CONSTRUCTOR_BLOCKER)
+        if not server._executable_and_properties_exist():
+            return "Server does not exist."
+        return server
 
     @property
     def _folder(self) -> Path:
@@ -101,14 +177,73 @@ class BedrockServer:
 
     @staticmethod
     def check_screen() -> bool:
-        return len(run(["which", "screen"], capture_output=True).stdout) > 0
+        return which("screen") is not None
+
+    @classmethod
+    def _supervisor_client(cls) -> SupervisorClient | None:
+        """
+        :return: Client for the supervisor if it is running, in which case it manages all servers instead of screen
+        """
+        client = SupervisorClient(cls._DIR.joinpath(cls._SUPERVISOR_SOCKET_NAME))
+        return client if client.is_available() else None
+
+    @classmethod
+    def check_supervisor(cls) -> bool:
+        return cls._supervisor_client() is not None
+
+    @classmethod
+    def run_supervisor(cls) -> None:
+        """
+        Runs the supervisor in the foreground until it is shut down.
+        :raises RuntimeError: If the supervisor is already running.
+        """
+        from ._supervisor import Supervisor
+        cls._DIR.mkdir(parents=True, exist_ok=True)
+        Supervisor(cls._DIR.joinpath(cls._SUPERVISOR_SOCKET_NAME)).run()
+
+    @classmethod
+    def run_scheduler(cls, report: Callable[[str, str], None]) -> None:
+        """
+        Runs the maintenance scheduler in the foreground until interrupted.
+        :param report: Called with a server name and a message whenever a job runs, waits or fails.
+        :raises RuntimeError: If the scheduler is already running.
+        """
+        Scheduler(cls._DIR.joinpath(cls._SCHEDULER_DIR_NAME), report).run()
+
+    @classmethod
+    def shutdown_supervisor(cls) -> None:
+        """
+        Stops every server the supervisor runs, then the supervisor itself.
+        """
+        supervisor = cls._supervisor_client()
+        if supervisor is not None:
+            supervisor.request("shutdown")
 
     @staticmethod
     def _active_screen_sessions_display() -> str:
+        if not BedrockServer.check_screen():
+            return ""
         return run(["screen", "-ls"], capture_output=True, text=True).stdout
 
-    def is_running(self) -> bool:
-        return self._session_name in self._active_screen_sessions_display()
+    @staticmethod
+    def _active_session_names(sessions_display: str | None = None) -> set[str]:
+        """
+        Servers started in screen before the supervisor keep running there, so both are checked.
+        :param sessions_display: Output of screen -ls to reuse, instead of running it again.
+        """
+        session_names = set()
+        supervisor = BedrockServer._supervisor_client()
+        if supervisor is not None:
+            session_names.update(supervisor.request("status")["sessions"])
+        if sessions_display is None:
+            sessions_display = BedrockServer._active_screen_sessions_display()
+        return session_names | set(re.findall(r"^\s*\d+\.(\S+)", sessions_display, re.MULTILINE))
+
+    def is_running(self, sessions_display: str | None = None) -> bool:
+        """
+        :param sessions_display: Output of screen -ls to reuse, instead of running it again.
+        """
+        return self._session_name in self._active_session_names(sessions_display)
 
     @staticmethod
     def _validate_name(server_name: str) -> bool:
@@ -118,55 +253,237 @@ class BedrockServer:
     def _session_name(self) -> str:
         return f"bsw-{self.server_name}"
 
+    def _session_supervisor(self) -> SupervisorClient | None:
+        """
+        :return: Client for the supervisor if it runs this server's session, or None if screen does or it is not running
+        """
+        supervisor = self._supervisor_client()
+        if supervisor is not None and self._session_name in supervisor.request("status")["sessions"]:
+            return supervisor
+        return None
+
     @property
     def attach_session_command(self) -> str:
+        if self._session_supervisor() is not None:
+            return f"bsw console {self.server_name}"
         return f"screen -r {self._session_name}"
 
-    def start(self) -> None:
+    def attach_console(self) -> None:
+        """
+        Connects the terminal to the console of a server run by the supervisor.
+        :raises ConnectionError: If the supervisor is not running.
+        """
+        SupervisorClient(self._DIR.joinpath(self._SUPERVISOR_SOCKET_NAME)).attach(self._session_name)
+
+    @timed("start")
+    def start(self, download_url: str | None = None) -> None:
+        """
+        :param download_url: Already resolved download URL of the latest server, to skip resolving it again.
+        """
         if self.is_running():
             raise self.ServerRunningError("Server is already running.")
-        self._download_and_update()
-        for server_name in self.list_servers():
-            if server_name == self.server_name:
-                continue
-            other_server = self.__class__(server_name, self._CONSTRUCTOR_BLOCKER)
-            other_server_ports = (other_server.get_port_number(), other_server.get_port_number(ipv6=True))
-            if self.get_port_number() in other_server_ports or self.get_port_number(ipv6=True) in other_server_ports:
+        self._download_and_update(download_url)
+        port_index = self._port_index()
+        for port in (self.get_port_number(), self.get_port_number(ipv6=True)):
+            if any(server_name != self.server_name for server_name in port_index.get(port, [])):
                 raise self.PortConflictError("Server ports conflict with another server.")
         if self._get_server_property("enable-lan-visibility") != "false":
             raise self.PortConflictError("Server cannot be set to enable LAN visibility as it may cause port conflicts.")
-        run(["screen", "-dmS", self._session_name, "bash", str(self._starter_path)])
-        sleep(0.3)
-        self._expand_session_height()
+        self._write_starter()
+        self._console_log_path.unlink(missing_ok=True)
+        supervisor = self._supervisor_client()
+        if supervisor is not None:
+            supervisor.request(
+                "start",
+                session=self._session_name,
+                command=["bash", str(self._starter_path)],
+                cwd=str(self.server_subfolder),
+                log=str(self._console_log_path)
+            )
+        else:
+            run(["screen", "-L", "-Logfile", str(self._console_log_path), "-dmS", self._session_name, "bash", str(self._starter_path)])
+            sleep(0.3)
+            self._act_on_session("logfile", "flush", "0")
+            self._expand_session_height()
+        self._player_tracker.reset(synced=True)
 
+    @timed("stop")
     def stop(self, force_stop: bool = False) -> None:
-        if not self.is_running():
+        """
+        Returns once the server process has exited, killing it if it does not exit in time after the stop command.
+        :raises TimeoutError: If the server is still running even after being killed.
+        """
+        session_pid = self._session_pid()
+        if session_pid is None:
             return
         if not force_stop and self.get_player_count():
             raise self.PlayersOnServerError("Cannot stop server while players are online without force stopping.")
         self._minecraft_execute("stop")
+        if self._wait_for_exit(session_pid, self._STOP_TIMEOUT_SECONDS):
+            return
+        self._kill(session_pid)
+        if not self._wait_for_exit(session_pid, self._KILL_TIMEOUT_SECONDS):
+            raise TimeoutError("Server did not exit even after being killed.")
+
+    @timed("restart")
+    def restart(self, force_stop: bool = False, download_url: str | None = None) -> "UpdatePlan | None":
+        """
+        Downloads and installs any new version into the version store while the server still runs, so the server is
+        only down for its shutdown, linking in the changed files and its launch.
+        :param download_url: Already resolved and installed download URL of the latest server, to skip preparing it again.
+        :return: The applied update plan, or None if the server was already up to date
+        """
+        download_url = download_url or self.prepare_update([self])
+        self.stop(force_stop)
+        update_plan = self._download_and_update(download_url)
+        self.start(download_url)
+        return update_plan
+
+    def _session_pid(self) -> int | None:
+        """
+        :return: PID of the session's top process, the screen session or the supervisor's starter, or None if it is not running
+        """
+        supervisor = self._supervisor_client()
+        if supervisor is not None:
+            session_pid = supervisor.request("status")["sessions"].get(self._session_name)
+            if session_pid is not None:
+                return session_pid
+        for pid, session_name in re.findall(r"^\s*(\d+)\.(\S+)", self._active_screen_sessions_display(), re.MULTILINE):
+            if session_name == self._session_name:
+                return int(pid)
+        return None
+
+    @staticmethod
+    def _wait_for_exit(pid: int, timeout_seconds: float) -> bool:
+        """
+        Waits on a pidfd where available, which wakes up as soon as the process exits, and otherwise polls /proc.
+        :return: Whether the process exited in time
+        """
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except (AttributeError, OSError):
+            deadline = monotonic() + timeout_seconds
+            while monotonic() < deadline:
+                try:
+                    with open(f"/proc/{pid}/stat", "r") as file:
+                        if file.read().rpartition(")")[2].split()[0] == "Z":
+                            return True
+                except FileNotFoundError:
+                    return True
+                sleep(0.05)
+            return False
+        try:
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            return bool(poller.poll(timeout_seconds * 1000))
+        finally:
+            os.close(pidfd)
 
-    def backup(self, enforce_cooldown_minutes: int, backup_limit: int, force_backup: bool = False) -> None:
+    def _kill(self, session_pid: int) -> None:
+        server_pid = find_process(self._executable_path)
+        if server_pid is not None:
+            try:
+                os.kill(server_pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if self._session_supervisor() is not None:
+            # The supervisor starts every session as its own process group
+            try:
+                os.killpg(session_pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            self._act_on_session("quit")
+
+    @timed("backup")
+    def backup(
+            self,
+            enforce_cooldown_minutes: int,
+            retention: "int | BedrockServer.RetentionPolicy",
+            force_backup: bool = False,
+            online: bool = False,
+            incremental: bool = False,
+            archive_writer: ArchiveWriter | None = None
+    ) -> None:
+        """
+        :param retention: Which backups to keep afterwards, or just how many of the newest.
+        :param online: If the server is running, back it up in place using save hold/query/resume instead of stopping it.
+        :param incremental: Store a deduplicated snapshot instead of a zip archive, so only changed files take up space.
+        :param archive_writer: Format, compression and throttling of the archive, or None for a zip with default settings.
+            An incremental backup is throttled the same way, but keeps the store's own format and compression.
+        """
         last_backup = self._recent_backup_age_minutes()
         if enforce_cooldown_minutes and last_backup is not None and not force_backup:
             if last_backup < enforce_cooldown_minutes:
                 raise FileExistsError("Previous backup is too recent.")
+        if online and self.is_running():
+            self._do_online_backup(incremental, archive_writer)
+            self._limit_backups(retention)
+            return
         stop_and_restart = self.is_running()
         if stop_and_restart:
             try:
                 self.stop(force_stop=force_backup)
             except self.PlayersOnServerError:
                 raise self.PlayersOnServerError("Cannot backup server while players are online without force stopping.")
-        self._do_backup()
+        self._do_backup(incremental=incremental, archive_writer=archive_writer)
         if stop_and_restart:
             self.start()
-        self._limit_backups(backup_limit)
+        self._limit_backups(retention)
 
     def message(self, message: str) -> None:
         if not self.is_running():
             return
+        self._minecraft_execute(self.say_command(message))
+
+    @staticmethod
+    def say_command(message: str) -> str:
+        """
+        :param message: Chat message, optionally using "&" instead of "§" for styling.
+        """
         message = sub(r"&(?!\s)", "§", message)
-        self._minecraft_execute(f"say {message}")
+        return f"say {message}"
+
+    def execute(self, commands: list[str]) -> None:
+        """
+        Sends the console commands in one injection: one supervisor request, or as few screen processes as its
+        command length limit allows.
+        """
+        supervisor = self._session_supervisor()
+        if supervisor is not None:
+            supervisor.request("execute", session=self._session_name, commands=commands)
+            return
+        batch = ""
+        for command in commands:
+            if batch and len(batch) + len(command) + 2 > self._SCREEN_STUFF_LIMIT:
+                self._act_on_session("stuff", batch)
+                batch = ""
+            batch += f"{command}\\n"
+        if batch:
+            self._act_on_session("stuff", batch)
+
+    @classmethod
+    def broadcast(cls, messages: list[str], servers: "list[BedrockServer] | None" = None, commands_per_second: float = 10.0) -> dict[str, int]:
+        """
+        Sends the chat messages to every running server, or the given ones, through a rate limited command queue.
+        :return: How many injections each server got
+        """
+        if servers is None:
+            servers = [cls(server_name, cls._CONSTRUCTOR_BLOCKER) for server_name in cls.list_online_servers()]
+        command_queue = CommandQueue(commands_per_second)
+        command_queue.say(servers, messages)
+        return command_queue.run()
+
+    @classmethod
+    def count_down(cls, servers: "list[BedrockServer]", seconds: int, message_format: str) -> None:
+        """
+        Announces in chat of the running servers how much time is left, returning once the time is up.
+        :param message_format: Message with a {time} placeholder, like "Server restarting in {time}."
+        """
+        command_queue = CommandQueue()
+        command_queue.run(command_queue.countdown(servers, seconds, message_format))
 
     def purge(self) -> None:
         if self.is_running():
@@ -177,51 +494,211 @@ class BedrockServer:
         run(["screen", "-S", self._session_name, "-p", "0", "-X", *args])
 
     def _minecraft_execute(self, command: str) -> None:
-        self._act_on_session("stuff", f"{command}\\n")
+        self.execute([command])
 
     def _expand_session_height(self) -> None:
         self._act_on_session("height", "200")
 
-    def get_player_count(self) -> int:
+    @property
+    def _console_log_path(self) -> Path:
+        return self._folder.joinpath("console.log")
+
+    def _enable_session_log(self) -> None:
         """
-        :return: Online player count, except -1 if unable to determine, typically due to many online
+        Turns on console logging for sessions started before logging was part of start.
         """
-        self._expand_session_height()
-        sleep(0.3)
-        self._minecraft_execute("list")
-        sleep(0.3)
-        temp_log = self._DIR.joinpath(f"{self._session_name}.txt")
-        self._act_on_session("hardcopy", str(temp_log))
+        if self._console_log_path.is_file():
+            return
+        self._act_on_session("logfile", str(self._console_log_path))
+        self._act_on_session("logfile", "flush", "0")
+        self._act_on_session("log", "on")
         sleep(0.3)
-        content_lines = []
-        pattern = r"(\d+)/(\d+)\s+players?"
-        with open(temp_log, "r", errors="ignore") as log:
-            content_lines = log.readlines()
-        for line in reversed(content_lines):
-            if "chat" in line.lower() or "<" in line:
-                continue
-            match = re.search(pattern, line)
-            if match:
-                temp_log.unlink()
-                return int(match.group(1))
-        temp_log.unlink()
-        return -1
+        self._player_tracker.reset(synced=False)
+
+    def _console_log_size(self) -> int:
+        try:
+            return self._console_log_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _read_console_lines(self, offset: int) -> list[str]:
+        """
+        :return: Complete console lines written since the byte offset, without timestamp prefixes
+        """
+        try:
+            with open(self._console_log_path, "rb") as log:
+                log.seek(offset)
+                content = log.read()
+        except FileNotFoundError:
+            return []
+        # A line the server is still writing is left for the next read, as its start would look like the whole line
+        content = content[:content.rfind(b"\n") + 1].decode(errors="ignore")
+        lines = content.replace("\r", "").split("\n")[:-1]
+        return [re.sub(r"^\[[^\]]*\]\s*", "", line).strip() for line in lines]
+
+    @property
+    def _player_tracker(self) -> PlayerTracker:
+        return PlayerTracker(self._console_log_path, self._folder.joinpath("players.json"))
+
+    def get_online_players(self) -> list[str] | None:
+        """
+        :return: Names of online players, or None if unable to determine
+        """
+        self._enable_session_log()
+        tracker = self._player_tracker
+        tracker.update()
+        if not tracker.synced:
+            self._minecraft_execute("list")
+            deadline = monotonic() + self._PLAYER_RESYNC_TIMEOUT_SECONDS
+            while not tracker.synced and monotonic() < deadline:
+                sleep(0.05)
+                tracker.update()
+            if not tracker.synced:
+                return None
+        return tracker.players
+
+    @timed("player_query")
+    def get_player_count(self) -> int:
+        """
+        :return: Online player count, except -1 if unable to determine
+        """
+        players = self.get_online_players()
+        return -1 if players is None else len(players)
 
     @classmethod
-    def list_online_servers(cls) -> list[str]:
-        active_sessions_display = BedrockServer._active_screen_sessions_display()
-        return [server for server in cls.list_servers() if server in active_sessions_display]
+    def list_online_servers(cls, sessions_display: str | None = None) -> list[str]:
+        """
+        :param sessions_display: Output of screen -ls to reuse, instead of running it again.
+        """
+        active_session_names = cls._active_session_names(sessions_display)
+        return [server for server in cls.list_servers() if cls(server, cls._CONSTRUCTOR_BLOCKER)._session_name in active_session_names]
+
+    @classmethod
+    def fleet_status(cls, timeout_seconds: float = 5.0, max_workers: int = 16) -> list["BedrockServer.ServerStatus"]:
+        """
+        Snapshot of every server from one directory scan and one screen -ls, querying online servers in parallel.
+        :param timeout_seconds: Time allowed for all player count queries together.
+        :param max_workers: Most player count queries to run at once.
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait
+        active_session_names = cls._active_session_names()
+        servers = [cls(server_name, cls._CONSTRUCTOR_BLOCKER) for server_name in sorted(cls.list_servers())]
+        online_servers = [server for server in servers if server._session_name in active_session_names]
+        player_counts: dict[str, int] = {}
+        futures = {}
+        if online_servers:
+            executor = ThreadPoolExecutor(max_workers=min(max_workers, len(online_servers)))
+            futures = {server.server_name: executor.submit(server.get_player_count) for server in online_servers}
+            wait(futures.values(), timeout=timeout_seconds)
+            executor.shutdown(wait=False, cancel_futures=True)
+            for server_name, future in futures.items():
+                if future.done() and future.exception() is None and future.result() >= 0:
+                    player_counts[server_name] = future.result()
+        return [
+            cls.ServerStatus(
+                server.server_name,
+                server.get_port_number(),
+                server.get_port_number(ipv6=True),
+                server.server_name in futures,
+                player_counts.get(server.server_name)
+            )
+            for server in servers
+        ]
+
+    @classmethod
+    def select_servers(cls, patterns: list[str]) -> "list[BedrockServer] | str":
+        """
+        :param patterns: Case-insensitive server names or globs like "lobby*", from one scan of the servers folder.
+        :return: Matching servers in name order, or an error message if a name does not exist or a glob matches nothing
+        """
+        server_names = sorted(cls.list_servers())
+        selected: list[str] = []
+        for pattern in patterns:
+            pattern = pattern.lower()
+            if any(character in pattern for character in "*?["):
+                matches = [server_name for server_name in server_names if fnmatchcase(server_name, pattern)]
+                if not matches:
+                    return f"No servers match: {pattern}"
+            elif pattern in server_names:
+                matches = [pattern]
+            else:
+                return f"Server does not exist: {pattern}"
+            selected.extend(server_name for server_name in matches if server_name not in selected)
+        return [cls(server_name, cls._CONSTRUCTOR_BLOCKER) for server_name in sorted(selected)]
+
+    @classmethod
+    def run_bulk(
+            cls,
+            servers: list["BedrockServer"],
+            action: Callable[["BedrockServer"], object],
+            max_workers: int = 4,
+            stagger_seconds: float = 0.0
+    ) -> list["BedrockServer.BulkResult"]:
+        """
+        Runs the action on every server, a few at a time, collecting what each returned or raised.
+        :param max_workers: Most servers to act on at once.
+        :param stagger_seconds: Least time between starting the action on one server and the next, to spread out
+            heavy disk use.
+        :return: Result for every server, in the given order
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        started = monotonic()
+
+        def run_one(index: int, server: "BedrockServer") -> "BedrockServer.BulkResult":
+            delay = started + index * stagger_seconds - monotonic()
+            if delay > 0:
+                sleep(delay)
+            try:
+                return cls.BulkResult(server.server_name, action(server), None)
+            except Exception as error:
+                return cls.BulkResult(server.server_name, None, error)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(servers)))) as executor:
+            return list(executor.map(run_one, range(len(servers)), servers))
+
+    @classmethod
+    def _operation_timings(cls) -> OperationTimings:
+        return OperationTimings(cls._DIR.joinpath(cls._METRICS_DIR_NAME, "timings.json"))
+
+    def get_metrics(self, timings: dict | None = None) -> ServerMetrics:
+        """
+        :param timings: Operation timings of every server to reuse, instead of reading them again.
+        """
+        if timings is None:
+            timings = self._operation_timings().read()
+        pid = find_process(self._executable_path)
+        return ServerMetrics(
+            self.server_name,
+            sample_process(pid) if pid is not None else None,
+            directory_size(self.server_subfolder.joinpath(self._WORLDS_DIR_NAME)),
+            BackupCatalog.disk_usage(self._backup_catalog.load(save_rebuilt=False)),
+            timings.get(self.server_name, {})
+        )
+
+    @classmethod
+    def collect_metrics(cls) -> list[ServerMetrics]:
+        timings = cls._operation_timings().read()
+        return [cls(server_name, cls._CONSTRUCTOR_BLOCKER).get_metrics(timings) for server_name in sorted(cls.list_servers())]
 
     @staticmethod
-    def _get_download_url() -> str:
-        try:
-            response = requests.get(BedrockServer._UPDATE_LINKS_URL, headers=BedrockServer._USER_AGENT, timeout=10)
-            response.raise_for_status()
-            urls_data: dict = response.json()
-        except requests.Timeout:
-            raise TimeoutError("Request for download links timed out.")
-        except requests.HTTPError:
-            raise ConnectionError("Request for download links unsuccessful.")
+    def write_metrics_textfile(path: Path, metrics: list[ServerMetrics]) -> None:
+        """
+        Atomically writes the metrics in the Prometheus text exposition format, for the node exporter textfile collector.
+        """
+        write_textfile(path, render_prometheus(metrics))
+
+    @classmethod
+    def _request_headers(cls) -> dict[str, str]:
+        if cls._USER_AGENT is None:
+            from fake_useragent import UserAgent
+            cls._USER_AGENT = {"User-Agent": UserAgent(platforms=["desktop"]).random}
+        return cls._USER_AGENT
+
+    @classmethod
+    def _get_download_url(cls) -> str:
+        from ._links_cache import LinksCache
+        links_cache_path = cls._DIR.joinpath(cls._CACHE_DIR_NAME, "links.json")
+        urls_data = LinksCache(links_cache_path, cls._UPDATE_LINKS_URL, cls._request_headers(), cls.links_ttl_seconds, cls.offline).get()
         urls_data: list[dict] = urls_data["result"]["links"]
         download_url: str | None = None
         for url_data in urls_data:
@@ -231,39 +708,137 @@ class BedrockServer:
             raise KeyError("No download URL for Linux server found.")
         return download_url
 
-    def _download_and_update(self) -> None:
-        download_url = self._get_download_url()
+    @timed("update")
+    def _download_and_update(self, download_url: str | None = None) -> "UpdatePlan | None":
+        """
+        :param download_url: Already resolved download URL of the latest server, to skip resolving it again.
+        :return: The applied update plan, or None if the server was already up to date
+        """
+        from ._download_cache import DownloadCache
+        from ._update_plan import UpdatePlan
+        from ._version_store import VersionStore
+        download_url = download_url or self._get_download_url()
         overwrite_all = False if self._executable_and_properties_exist() else True
         if self._last_update_url == download_url and not overwrite_all:
-            return
-        try:
-            server_zip_response = requests.get(download_url, headers=self._USER_AGENT, timeout=30)
-            server_zip_response.raise_for_status()
-            server_zip_data = server_zip_response.content
-        except requests.Timeout:
-            raise TimeoutError("Request for server download timed out.")
-        except requests.HTTPError:
-            raise ConnectionError("Request for server download unsuccessful.")
+            return None
+        server_zip_path = DownloadCache(self._DIR.joinpath(self._CACHE_DIR_NAME, "downloads"), self._request_headers()).fetch(download_url)
+        version = Path(urlparse(download_url).path).stem
+        version_store = VersionStore(self._DIR.joinpath(self._VERSIONS_DIR_NAME))
+        available = version_store.install(version, server_zip_path)
+        exclude_files = set() if overwrite_all else set(self._UPDATER_EXCLUDE_FILES)
+        exclude_dirs = set() if overwrite_all else set(self._UPDATER_EXCLUDE_DIRS)
+        installed = UpdatePlan.read_manifest(self._install_manifest_path)
+        update_plan = UpdatePlan.create(available, self.server_subfolder, installed, exclude_files, exclude_dirs)
+        update_plan.apply(version_store.version_folder(version), self.server_subfolder, self._is_shared_file)
+        update_plan.write_manifest(self._install_manifest_path)
         self._last_update_url = download_url
-        with ZipFile(BytesIO(server_zip_data)) as server_zip:
-            if overwrite_all:
-                members = server_zip.namelist()
-            else:
-                members = [file for file in server_zip.namelist() if file not in self._UPDATER_EXCLUDE_FILES]
-                members = [file for file in members for folder in self._UPDATER_EXCLUDE_DIRS if not file.startswith(folder)]
-            server_zip.extractall(self.server_subfolder, members=members)
+        if not self._settings_path.is_file():
+            self._settings_path.write_text(DEFAULT_SETTINGS_FILE)
+        self._write_starter()
+        run(["chmod", "+x", self._executable_path], check=True)
+        return update_plan
+
+    def _write_starter(self) -> None:
+        """
+        Writes the starter script, launching the server through whatever applies its resource settings.
+        :raises ValueError: If the resource settings are invalid.
+        """
+        prefix = self._resource_settings.launch_prefix(self._cpu_assignment())
         with open(self._starter_path, "w") as starter_file:
             starter_file.writelines([
                 "#!/usr/bin/env bash\n",
                 f"cd \"{self.server_subfolder}\"\n",
-                "LD_LIBRARY_PATH=. ./bedrock_server"
+                f"LD_LIBRARY_PATH=. {shlex.join(prefix)} ./bedrock_server" if prefix else "LD_LIBRARY_PATH=. ./bedrock_server"
             ])
-        run(["chmod", "+x", self._executable_path], check=True)
-        run(["chmod", "+x", self._starter_path], check=True)
+        self._starter_path.chmod(0o755)
+
+    @property
+    def _settings_path(self) -> Path:
+        return self.server_subfolder.joinpath(self._SETTINGS_FILE_NAME)
+
+    @property
+    def _resource_settings(self) -> ResourceSettings:
+        """
+        :raises ValueError: If the resource settings are invalid.
+        """
+        if not self._settings_path.is_file():
+            return ResourceSettings()
+        return ResourceSettings.from_properties(self._load_properties(self._settings_path))
+
+    @property
+    def _maintenance_policy(self) -> MaintenancePolicy:
+        """
+        :raises ValueError: If the maintenance settings are invalid.
+        """
+        if not self._settings_path.is_file():
+            return MaintenancePolicy()
+        return MaintenancePolicy.from_properties(self._load_properties(self._settings_path))
+
+    def _cpu_assignment(self) -> list[int] | None:
+        """
+        :return: CPUs to pin the server to, or None for any
+        """
+        settings = self._resource_settings
+        if settings.cpu_affinity == "none":
+            return None
+        if settings.cpu_affinity != "auto":
+            return parse_cpu_list(settings.cpu_affinity)
+        auto_servers = {self.server_name}
+        for server_name in self.list_servers():
+            try:
+                if BedrockServer(server_name, self._CONSTRUCTOR_BLOCKER)._resource_settings.cpu_affinity == "auto":
+                    auto_servers.add(server_name)
+            except ValueError:
+                continue
+        return spread_cpus(sorted(auto_servers).index(self.server_name), settings.cpu_cores, numa_nodes())
+
+    def update(self, download_url: str | None = None) -> "UpdatePlan | None":
+        """
+        :param download_url: Already resolved download URL of the latest server, to skip resolving it again.
+        :return: The applied update plan, or None if the server was already up to date
+        :raises ServerRunningError: If the server is running.
+        """
+        if self.is_running():
+            raise self.ServerRunningError("Cannot update server while it is running.")
+        return self._download_and_update(download_url)
+
+    @classmethod
+    def prepare_update(cls, servers: list["BedrockServer"]) -> str:
+        """
+        Resolves the latest download URL once and, if any of the servers is out of date, downloads and installs that
+        version once, so updating the servers afterwards only links files.
+        :return: The download URL to pass on to each server
+        """
+        from ._download_cache import DownloadCache
+        from ._version_store import VersionStore
+        download_url = cls._get_download_url()
+        if any(server._last_update_url != download_url for server in servers):
+            server_zip_path = DownloadCache(cls._DIR.joinpath(cls._CACHE_DIR_NAME, "downloads"), cls._request_headers()).fetch(download_url)
+            VersionStore(cls._DIR.joinpath(cls._VERSIONS_DIR_NAME)).install(Path(urlparse(download_url).path).stem, server_zip_path)
+        return download_url
+
+    def _is_shared_file(self, name: str) -> bool:
+        """
+        :return: Whether a server file is never modified by the server, so it can be hardlinked from the version store
+        """
+        if name == self._BEDROCK_SERVER_PROGRAM_NAME:
+            return True
+        return "/" in name and name.split("/", 1)[0] not in self._UPDATER_EXCLUDE_DIRS
 
     def _get_server_property(self, key: str, default: str | None = None) -> str | None:
-        self._load_server_properties()
-        return self._SERVER_PROPERTIES.get(key, default)
+        return self._load_server_properties().get(key, default)
+
+    @classmethod
+    def _port_index(cls) -> dict[int, list[str]]:
+        """
+        :return: Names of the servers using each IPv4 and IPv6 port, from one pass over all servers
+        """
+        port_index: dict[int, list[str]] = {}
+        for server_name in cls.list_servers():
+            server = cls(server_name, cls._CONSTRUCTOR_BLOCKER)
+            for port in {server.get_port_number(), server.get_port_number(ipv6=True)}:
+                port_index.setdefault(port, []).append(server_name)
+        return port_index
 
     def get_port_number(self, ipv6: bool = False) -> int:
         port = self._get_server_property("server-port" if not ipv6 else "server-portv6")
@@ -277,55 +852,314 @@ class BedrockServer:
             raise ValueError("Server port value in server.properties is out of range (too high or low).")
         return port
 
+    @property
+    def _backup_store(self) -> BackupStore:
+        return BackupStore(self.backups_subfolder)
+
+    @property
+    def _backup_catalog(self) -> BackupCatalog:
+        return BackupCatalog(self.backups_subfolder.joinpath(self._BACKUP_CATALOG_FILE_NAME), self._rebuild_backup_catalog)
+
+    def _rebuild_backup_catalog(self) -> dict:
+        """
+        Builds the catalog from the backups folder, for backups made before there was a catalog.
+        """
+        backups = {}
+        for suffix in self._BACKUP_SUFFIXES:
+            for path in self.backups_subfolder.glob(f"*{suffix}"):
+                try:
+                    created = datetime.strptime(path.name.split(".", 1)[0], self._BACKUP_NAME_FORMAT).timestamp()
+                except ValueError:
+                    created = path.stat().st_mtime
+                backups[path.name] = {"created": created, "size": path.stat().st_size, "type": suffix.lstrip("."), "version": None}
+        return {"backups": backups, "store_size": self._backup_store.stored_size()}
+
     def list_backups(self) -> list[str]:
-        backup_directory = Path(self.backups_subfolder)
-        backup_directory.mkdir(parents=True, exist_ok=True)
-        existing_backups = list(backup_directory.glob("*.zip"))
-        return [str(backup.relative_to(backup_directory)) for backup in existing_backups]
-
-    def _limit_backups(self, limit: int) -> None:
-        backups = self.list_backups()
-        if len(backups) <= limit:
+        """
+        :return: Names of the backups, oldest first
+        """
+        return list(self._backup_catalog.load()["backups"])
+
+    def _limit_backups(self, retention: "int | BedrockServer.RetentionPolicy") -> None:
+        if isinstance(retention, int):
+            retention = self.RetentionPolicy(keep_last=retention)
+        catalog = self._backup_catalog.load()
+        self._delete_backups(BackupCatalog.expired(catalog, retention.keep_last, retention.hourly, retention.daily, retention.weekly))
+        if retention.budget_bytes is None:
+            return
+        while True:
+            catalog = self._backup_catalog.load()
+            if len(catalog["backups"]) <= 1 or BackupCatalog.disk_usage(catalog) <= retention.budget_bytes:
+                return
+            self._delete_backups([next(iter(catalog["backups"]))])
+
+    def _delete_backups(self, backups: list[str]) -> None:
+        removed_snapshots = []
+        for backup in backups:
+            if backup.endswith(BackupStore.SNAPSHOT_SUFFIX):
+                removed_snapshots.append(backup.split(".", 1)[0])
+            else:
+                backup_path = self.backups_subfolder.joinpath(backup)
+                backup_path.unlink(missing_ok=True)
+                BackupIndex.path_for(backup_path).unlink(missing_ok=True)
+        store_size = self._backup_store.delete_snapshots(removed_snapshots) if removed_snapshots else None
+        self._backup_catalog.remove(backups, store_size)
+
+    def _backup_index(self, backup: str) -> BackupIndex:
+        """
+        :raises FileNotFoundError: If the backup does not exist.
+        """
+        if backup not in self.list_backups():
+            raise FileNotFoundError(f"Backup does not exist: {backup}")
+        backup_path = self.backups_subfolder.joinpath(backup)
+        if backup.endswith(BackupStore.SNAPSHOT_SUFFIX):
+            return BackupIndex.from_snapshot(self._backup_store.read_manifest(backup.split(".", 1)[0]))
+        index_path = BackupIndex.path_for(backup_path)
+        if index_path.is_file():
+            return BackupIndex.read(index_path)
+        if backup.endswith(".zip"):
+            return BackupIndex.from_zip(backup_path)
+        import tarfile
+        with tarfile.open(backup_path, "r|zst") as archive:
+            return BackupIndex("tar.zst", {member.name: [member.size, None] for member in archive if member.isfile()})
+
+    def describe_backups(self) -> list["BedrockServer.BackupInfo"]:
+        """
+        :return: Name, file count, uncompressed size and worlds of every backup, newest first
+        """
+        descriptions = []
+        for backup in sorted(self.list_backups(), reverse=True):
+            index = self._backup_index(backup)
+            descriptions.append(self.BackupInfo(backup, len(index.members), index.size, index.worlds))
+        return descriptions
+
+    def plan_restore(
+            self,
+            backup: str,
+            worlds: list[str] | None = None,
+            configs: bool = False,
+            paths: list[str] | None = None
+    ) -> RestorePlan:
+        """
+        Plans restoring the selected parts of a backup, or all of it if nothing is selected, extracting only the files
+        that differ from the live ones. Selected worlds and paths are made to match the backup exactly.
+        :param worlds: World folder names to restore.
+        :param configs: Restore the config files kept across updates.
+        :param paths: Paths relative to the server folder to restore.
+        :raises FileNotFoundError: If the backup does not exist.
+        :raises ValueError: If a world or path is not inside the server folder.
+        """
+        return RestorePlan.create(
+            self._backup_index(backup),
+            self.server_subfolder,
+            worlds,
+            self._UPDATER_EXCLUDE_FILES if configs else None,
+            self._UPDATER_EXCLUDE_DIRS if configs else None,
+            paths
+        )
+
+    def restore(self, backup: str, plan: RestorePlan) -> None:
+        """
+        :param plan: Plan made by plan_restore for the same backup.
+        :raises ServerRunningError: If the server is running.
+        """
+        if self.is_running():
+            raise self.ServerRunningError("Cannot restore server while it is running.")
+        if not plan.is_empty:
+            plan.apply(self.server_subfolder, self._read_backup_members(backup, plan.extract), self._BEDROCK_SERVER_PROGRAM_NAME)
+
+    def _read_backup_members(self, backup: str, names: list[str]) -> Iterator[tuple[str, Iterator[bytes]]]:
+        """
+        Reads only the given members: zip members and snapshot blobs directly, tar.zst members in one pass that ends
+        after the last one needed.
+        :return: Name and content chunks of every member, each to be consumed before moving on to the next
+        """
+        wanted = set(names)
+        backup_path = self.backups_subfolder.joinpath(backup)
+
+        def chunks_of(file) -> Iterator[bytes]:
+            while chunk := file.read(1024 * 1024):
+                yield chunk
+
+        if backup.endswith(BackupStore.SNAPSHOT_SUFFIX):
+            files = self._backup_store.read_manifest(backup.split(".", 1)[0])["files"]
+            for name in names:
+                yield name, self._backup_store.read_blob(files[name]["sha256"])
             return
-        backups.sort(reverse=True)
-        for backup in backups[limit:]:
-            self.backups_subfolder.joinpath(backup).unlink()
+        if backup.endswith(".zip"):
+            from zipfile import ZipFile
+            with ZipFile(backup_path) as archive:
+                for name in names:
+                    with archive.open(name) as member:
+                        yield name, chunks_of(member)
+            return
+        import tarfile
+        with tarfile.open(backup_path, "r|zst") as archive:
+            for member in archive:
+                if member.name not in wanted:
+                    continue
+                yield member.name, chunks_of(archive.extractfile(member))
+                wanted.discard(member.name)
+                if not wanted:
+                    break
 
     def _recent_backup_age_minutes(self) -> int | None:
-        backups = self.list_backups()
-        current_time = datetime.now()
-        if not len(backups):
+        backups = self._backup_catalog.load()["backups"]
+        if not backups:
             return None
-        backups.sort()
+        most_recent_backup = backups[next(reversed(backups))]
+        return max(1, int(round((datetime.now().timestamp() - most_recent_backup["created"]) / 60)))
+
+    def _do_backup(
+            self,
+            saved_files: dict[str, int] | None = None,
+            incremental: bool = False,
+            archive_writer: ArchiveWriter | None = None
+    ) -> None:
+        """
+        :param saved_files: World files reported by save query, relative to the worlds folder, mapped to their lengths.
+            World folders listed in it are archived from these files only, each truncated to its length.
+        :param incremental: Write a deduplicated snapshot into the backup store instead of an archive.
+        :param archive_writer: Writer for the archive, or None for a zip with default settings. Snapshots only take its
+            throttling.
+        """
+        created = datetime.now()
+        archive_writer = archive_writer or ArchiveWriter()
+        if incremental:
+            backup_name, partial_path = self._claim_backup_name(created, BackupStore.SNAPSHOT_SUFFIX)
+            try:
+                manifest = archive_writer.run_throttled(
+                    self._backup_store.write_snapshot, backup_name, list(self._backup_entries(saved_files or {}))
+                )
+            finally:
+                partial_path.unlink(missing_ok=True)
+            snapshot_path = self._backup_store.snapshot_path(backup_name)
+            self._backup_catalog.add(
+                snapshot_path.name, "snapshot", manifest["added_size"] + snapshot_path.stat().st_size,
+                self._installed_version, created.timestamp(), manifest["added_size"]
+            )
+            return
+        backup_name, partial_path = self._claim_backup_name(created, archive_writer.suffix)
+        backup_path = self.backups_subfolder.joinpath(f"{backup_name}{archive_writer.suffix}")
+        try:
+            members = archive_writer.write(partial_path, self._backup_entries(saved_files or {}))
+            BackupIndex(archive_writer.archive_format, {member.name: [member.size, member.crc] for member in members}).write(
+                BackupIndex.path_for(backup_path)
+            )
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+        partial_path.rename(backup_path)
+        self._backup_catalog.add(
+            backup_path.name, archive_writer.archive_format, backup_path.stat().st_size, self._installed_version, created.timestamp()
+        )
+
+    def _claim_backup_name(self, created: datetime, suffix: str) -> tuple[str, Path]:
+        """
+        Names a new backup after its creation time, numbered if another backup was made within the same second. The
+        name is claimed by creating its partial file, so concurrent backups never write to the same one.
+        :return: Name of the backup without its suffix, and its partial file
+        """
+        self.backups_subfolder.mkdir(parents=True, exist_ok=True)
+        base_name = created.strftime(self._BACKUP_NAME_FORMAT)
+        number = 1
         while True:
-            most_recent_backup = backups[-1].replace(".zip", "")
-            backups = backups[:-1]
-            if not len(backups):
-                break
+            backup_name = base_name if number == 1 else f"{base_name}_{number}"
+            partial_path = self.backups_subfolder.joinpath(f"{backup_name}{suffix}.part")
             try:
-                most_recent_backup_date = datetime.strptime(most_recent_backup, "%Y-%m-%d_%H-%M-%S")
-            except ValueError:
+                partial_path.open("x").close()
+            except FileExistsError:
+                number += 1
                 continue
-            return max(1, int(round((current_time - most_recent_backup_date).total_seconds() /  60)))
+            # Checked after claiming, as a finished backup's partial file is gone once it is renamed into place
+            if not self.backups_subfolder.joinpath(f"{backup_name}{suffix}").exists():
+                return backup_name, partial_path
+            partial_path.unlink()
+            number += 1
 
-    def _do_backup(self) -> None:
-        backup_name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
-        backup_path = self.backups_subfolder.joinpath(backup_name)
-        Path(self.backups_subfolder).mkdir(parents=True, exist_ok=True)
-        make_archive(str(backup_path), "zip", self.server_subfolder)
+    def _backup_entries(self, saved_files: dict[str, int]) -> Iterator[tuple[str, Path, int | None]]:
+        """
+        :return: Archive name, source path and length to copy (None for the whole file) for every file to back up
+        """
+        worlds_folder = self.server_subfolder.joinpath(self._WORLDS_DIR_NAME)
+        held_worlds = {file.split("/", 1)[0] for file in saved_files}
+        for path in sorted(self.server_subfolder.rglob("*")):
+            if not path.is_file():
+                continue
+            relative_path = path.relative_to(self.server_subfolder)
+            if path.is_relative_to(worlds_folder) and path.relative_to(worlds_folder).parts[0] in held_worlds:
+                continue
+            yield relative_path.as_posix(), path, None
+        for file, length in sorted(saved_files.items()):
+            yield f"{self._WORLDS_DIR_NAME}/{file}", worlds_folder.joinpath(file), length
+
+    def _do_online_backup(self, incremental: bool = False, archive_writer: ArchiveWriter | None = None) -> None:
+        """
+        Backs up the running server while it keeps running, using save hold, save query and save resume.
+        """
+        self._enable_session_log()
+        self._minecraft_execute("save hold")
+        try:
+            self._do_backup(self._query_saved_files(), incremental, archive_writer)
+        finally:
+            self._minecraft_execute("save resume")
+
+    def _query_saved_files(self) -> dict[str, int]:
+        """
+        :return: World files the server reports as ready to copy, mapped to the lengths to copy
+        :raises TimeoutError: If the server does not finish preparing the files in time.
+        """
+        deadline = monotonic() + self._SAVE_QUERY_TIMEOUT_SECONDS
+        while monotonic() < deadline:
+            offset = self._console_log_size()
+            self._minecraft_execute("save query")
+            reply_deadline = monotonic() + self._SAVE_QUERY_INTERVAL_SECONDS
+            while monotonic() < reply_deadline:
+                sleep(0.05)
+                lines = [line for line in self._read_console_lines(offset) if line]
+                for index, line in enumerate(lines):
+                    # The file list is the next line, so keep polling until it is complete
+                    if not line.startswith("Data saved. Files are now ready to be copied.") or index + 1 == len(lines):
+                        continue
+                    saved_files = {}
+                    for entry in lines[index + 1].split(", "):
+                        file, _, length = entry.rpartition(":")
+                        if file and length.isdigit():
+                            saved_files[file] = int(length)
+                    return saved_files
+                if any(line.startswith("A previous save has not been completed.") for line in lines):
+                    break
+            sleep(self._SAVE_QUERY_INTERVAL_SECONDS)
+        raise TimeoutError("Server did not finish preparing world files for backup.")
 
     @classmethod
     def list_servers(cls) -> list[str]:
+        if not cls._DIR.is_dir():
+            return []
         return [server.name for server in cls._DIR.iterdir() if cls(server.name, cls._CONSTRUCTOR_BLOCKER)._executable_and_properties_exist()]
 
-    def _load_server_properties(self) -> None:
-        with open(self.server_subfolder.joinpath(self._BEDROCK_SERVER_PROPERTIES_FILE_NAME), "r") as file:
+    def _load_server_properties(self) -> dict[str, str]:
+        return self._load_properties(self.server_subfolder.joinpath(self._BEDROCK_SERVER_PROPERTIES_FILE_NAME))
+
+    @classmethod
+    def _load_properties(cls, properties_path: Path) -> dict[str, str]:
+        """
+        :return: Parsed properties file, only read again once the file's modification time or size changes
+        """
+        stat = properties_path.stat()
+        cached = cls._SERVER_PROPERTIES_CACHE.get(properties_path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        server_properties = {}
+        with open(properties_path, "r") as file:
             for line in file:
                 line = line.strip()
                 if not line or line.startswith("#"):
                     continue
                 key, value = line.split("=", 1)
-                self._SERVER_PROPERTIES[key] = value.strip()
+                server_properties[key] = value.strip()
+        cls._SERVER_PROPERTIES_CACHE[properties_path] = (stat.st_mtime_ns, stat.st_size, server_properties)
+        return server_properties
 
     def _executable_and_properties_exist(self) -> bool:
         starter_exists = self._starter_path.is_file()
@@ -337,6 +1171,10 @@ class BedrockServer:
     def _starter_path(self) -> Path:
         return self.server_subfolder.joinpath("starter.sh")
 
+    @property
+    def _install_manifest_path(self) -> Path:
+        return self._folder.joinpath("install_manifest.json")
+
     @property
     def _last_update_url_file_path(self) -> Path:
         return self._folder.joinpath("last_update_url.txt")
@@ -354,3 +1192,7 @@ class BedrockServer:
         self._last_update_url_file_path.parent.mkdir(parents=True, exist_ok=True)
         with open(self._last_update_url_file_path, "w") as file:
             file.write(url)
+
+    @property
+    def _installed_version(self) -> str | None:
+        return Path(urlparse(self._last_update_url).path).stem or None
@@ -0,0 +1,153 @@
+from collections import deque
+from pathlib import Path
+from ._supervisor_client import SupervisorClient
+import asyncio
+import json
+
+
+class Supervisor:
+    """
+    Long-lived process that owns server processes directly over stdin/stdout pipes, keeps recent output of each in a
+    ring buffer, appends it to the server's console log and answers requests on a local Unix socket.
+
+    Requests and responses are single lines of JSON. Every request has an "action", and every response has "ok" plus
+    either the result fields or an "error" message. An "attach" request turns the connection into a raw console.
+    """
+
+    _RING_BUFFER_LINES = 1000
+    _LINE_LIMIT = 16 * 1024 * 1024
+    _SHUTDOWN_TIMEOUT_SECONDS = 30.0
+
+    class _Session:
+
+        def __init__(self, process: asyncio.subprocess.Process, log_path: Path) -> None:
+            self.process = process
+            self.output: deque[bytes] = deque(maxlen=Supervisor._RING_BUFFER_LINES)
+            self.attached: set[asyncio.StreamWriter] = set()
+            self._log_file = open(log_path, "wb")
+
+        async def pump_output(self) -> None:
+            while line := await self.process.stdout.readline():
+                self.output.append(line)
+                self._log_file.write(line)
+                self._log_file.flush()
+                for writer in list(self.attached):
+                    writer.write(line)
+            await self.process.wait()
+            self._log_file.close()
+
+    def __init__(self, socket_path: Path) -> None:
+        self.socket_path = socket_path
+        self._sessions: dict[str, Supervisor._Session] = {}
+        self._stopping: asyncio.Event | None = None
+
+    def run(self) -> None:
+        """
+        Serves requests until a shutdown request is received.
+        :raises RuntimeError: If another supervisor is already listening on the socket.
+        """
+        if SupervisorClient(self.socket_path).is_available():
+            raise RuntimeError("Supervisor is already running.")
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        self._stopping = asyncio.Event()
+        self.socket_path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._handle_client, path=str(self.socket_path), limit=self._LINE_LIMIT)
+        self.socket_path.chmod(0o600)
+        try:
+            async with server:
+                await self._stopping.wait()
+            await self._stop_all()
+        finally:
+            self.socket_path.unlink(missing_ok=True)
+
+    async def _stop_all(self) -> None:
+        for session in self._sessions.values():
+            if session.process.returncode is None:
+                session.process.stdin.write(b"stop\n")
+        for session in self._sessions.values():
+            try:
+                await asyncio.wait_for(session.process.wait(), self._SHUTDOWN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                session.process.kill()
+
+    def _running_sessions(self) -> dict[str, "Supervisor._Session"]:
+        return {name: session for name, session in self._sessions.items() if session.process.returncode is None}
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if request.get("action") == "attach":
+                        await self._attach(request["session"], reader, writer)
+                        return
+                    response = {"ok": True, **await self._dispatch(request)}
+                except (KeyError, ValueError, RuntimeError, OSError) as error:
+                    response = {"ok": False, "error": str(error)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> dict:
+        action = request["action"]
+        if action == "ping":
+            return {}
+        if action == "status":
+            return {"sessions": {name: session.process.pid for name, session in self._running_sessions().items()}}
+        if action == "start":
+            return await self._start(request["session"], request["command"], request["cwd"], Path(request["log"]))
+        if action == "execute":
+            session = self._get_session(request["session"])
+            session.process.stdin.write("".join(f"{command}\n" for command in request["commands"]).encode())
+            await session.process.stdin.drain()
+            return {}
+        if action == "output":
+            session = self._get_session(request["session"])
+            lines = list(session.output)[-int(request.get("lines", self._RING_BUFFER_LINES)):]
+            return {"output": b"".join(lines).decode(errors="ignore")}
+        if action == "shutdown":
+            self._stopping.set()
+            return {}
+        raise ValueError(f"Unknown action: {action}")
+
+    def _get_session(self, name: str) -> "Supervisor._Session":
+        session = self._running_sessions().get(name)
+        if session is None:
+            raise KeyError(f"Session is not running: {name}")
+        return session
+
+    async def _start(self, name: str, command: list[str], cwd: str, log_path: Path) -> dict:
+        if name in self._running_sessions():
+            raise RuntimeError(f"Session is already running: {name}")
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=self._LINE_LIMIT,
+            start_new_session=True
+        )
+        session = self._Session(process, log_path)
+        self._sessions[name] = session
+        asyncio.create_task(session.pump_output())
+        return {"pid": process.pid}
+
+    async def _attach(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Sends recent output, then streams new output to the client and passes lines from the client to the server.
+        """
+        session = self._get_session(name)
+        writer.write(b"".join(session.output))
+        session.attached.add(writer)
+        try:
+            while (line := await reader.readline()) and session.process.returncode is None:
+                session.process.stdin.write(line)
+                await session.process.stdin.drain()
+        finally:
+            session.attached.discard(writer)
@@ -0,0 +1,68 @@
+from pathlib import Path
+from threading import Thread
+import json
+import socket
+import sys
+
+
+class SupervisorClient:
+    """
+    Client for the supervisor's Unix socket API.
+    """
+
+    _TIMEOUT_SECONDS = 10.0
+
+    def __init__(self, socket_path: Path) -> None:
+        self.socket_path = socket_path
+
+    def _connect(self) -> socket.socket:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self._TIMEOUT_SECONDS)
+        try:
+            connection.connect(str(self.socket_path))
+        except OSError:
+            connection.close()
+            raise ConnectionError("Supervisor is not running.")
+        return connection
+
+    def is_available(self) -> bool:
+        if not self.socket_path.exists():
+            return False
+        try:
+            self._connect().close()
+        except ConnectionError:
+            return False
+        return True
+
+    def request(self, action: str, **fields) -> dict:
+        """
+        :raises ConnectionError: If the supervisor is not running.
+        :raises RuntimeError: If the supervisor could not carry out the request.
+        """
+        with self._connect() as connection:
+            connection.sendall(json.dumps({"action": action, **fields}).encode() + b"\n")
+            with connection.makefile("rb") as responses:
+                response = json.loads(responses.readline() or b"{}")
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Supervisor closed the connection."))
+        return response
+
+    def attach(self, session: str) -> None:
+        """
+        Connects the terminal to the session's console until input ends or is interrupted.
+        """
+        with self._connect() as connection:
+            connection.settimeout(None)
+            connection.sendall(json.dumps({"action": "attach", "session": session}).encode() + b"\n")
+
+            def show_output() -> None:
+                while data := connection.recv(65536):
+                    sys.stdout.buffer.write(data)
+                    sys.stdout.buffer.flush()
+
+            Thread(target=show_output, daemon=True).start()
+            try:
+                for line in sys.stdin.buffer:
+                    connection.sendall(line)
+            except KeyboardInterrupt:
+                pass
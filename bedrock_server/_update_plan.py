@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import Callable
+from ._file_utils import write_json_atomically
+from ._version_store import VersionStore
+import json
+
+
+class UpdatePlan:
+    """
+    Difference between a server version and the files installed from a previous one, worked out from the CRC-32 and size
+    in the zip's central directory, so updating only touches files that are new, changed or removed upstream.
+    """
+
+    def __init__(self, extract: list[str], remove: list[str], installed: dict[str, list[int]], manifest: dict[str, list[int]]) -> None:
+        self.extract = extract
+        self.remove = remove
+        self._installed = installed
+        self.manifest = manifest
+
+    @classmethod
+    def create(
+            cls,
+            available: dict[str, list[int]],
+            target: Path,
+            installed: dict[str, list[int]],
+            exclude_files: set[str],
+            exclude_dirs: set[str]
+    ) -> "UpdatePlan":
+        """
+        :param available: Manifest of the new version, mapping member names to CRC-32 and size.
+        :param installed: Manifest of files installed from the previous zip, mapping member names to CRC-32 and size.
+        :param exclude_files: Member names that are never removed, nor extracted if already present.
+        :param exclude_dirs: Top-level folders whose members are never removed, nor extracted if already present.
+        """
+        def is_excluded(name: str) -> bool:
+            return name in exclude_files or name.split("/", 1)[0] in exclude_dirs
+
+        extract = []
+        manifest = {}
+        for name, entry in available.items():
+            if is_excluded(name):
+                if target.joinpath(name).exists():
+                    if name in installed:
+                        manifest[name] = installed[name]
+                    continue
+            manifest[name] = entry
+            if installed.get(name) == entry and cls._size_on_disk(target.joinpath(name)) == entry[1]:
+                continue
+            extract.append(name)
+        # Excluded files belong to the user once installed, even if upstream drops or renames them
+        remove = [name for name in installed if name not in manifest and not is_excluded(name)]
+        return cls(extract, remove, installed, manifest)
+
+    @staticmethod
+    def _size_on_disk(path: Path) -> int | None:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    @property
+    def added(self) -> list[str]:
+        return [name for name in self.extract if name not in self._installed]
+
+    @property
+    def changed(self) -> list[str]:
+        return [name for name in self.extract if name in self._installed]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.extract and not self.remove
+
+    def apply(self, source: Path, target: Path, is_shared: Callable[[str], bool]) -> None:
+        """
+        :param source: Folder the new version is extracted in.
+        :param is_shared: Whether a member is never modified by the server, so it can be hardlinked instead of copied.
+        """
+        for name in self.extract:
+            if is_shared(name):
+                VersionStore.link_or_copy(source.joinpath(name), target.joinpath(name))
+            else:
+                VersionStore.copy(source.joinpath(name), target.joinpath(name))
+        for name in self.remove:
+            target.joinpath(name).unlink(missing_ok=True)
+
+    @staticmethod
+    def read_manifest(path: Path) -> dict[str, list[int]]:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_manifest(self, path: Path) -> None:
+        write_json_atomically(path, self.manifest)
@@ -0,0 +1,94 @@
+from contextlib import AbstractContextManager
+from pathlib import Path
+from shutil import copyfile, rmtree
+from zipfile import ZipFile
+from ._file_utils import file_lock, write_json_atomically
+import json
+import os
+
+
+class VersionStore:
+    """
+    Host-wide store of extracted server versions. Each version is extracted once, made read-only, and shared with
+    servers through hardlinks.
+    """
+
+    _KEEP_VERSIONS = 3
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+
+    def version_folder(self, version: str) -> Path:
+        return self.folder.joinpath(version)
+
+    def _manifest_path(self, version: str) -> Path:
+        return self.folder.joinpath(f"{version}.json")
+
+    def _lock(self, version: str) -> AbstractContextManager[None]:
+        return file_lock(self.folder.joinpath(f"{version}.lock"))
+
+    def install(self, version: str, server_zip_path: Path) -> dict[str, list[int]]:
+        """
+        Extracts the server zip into the store unless that version is already there.
+        :return: Manifest of the version, mapping member names to CRC-32 and size
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with self._lock(version):
+            try:
+                with open(self._manifest_path(version), "r") as file:
+                    manifest = json.load(file)
+            except (FileNotFoundError, ValueError):
+                manifest = self._extract(version, server_zip_path)
+        self._manifest_path(version).touch()
+        self._prune()
+        return manifest
+
+    def _extract(self, version: str, server_zip_path: Path) -> dict[str, list[int]]:
+        partial_folder = self.folder.joinpath(f"{version}.part")
+        rmtree(partial_folder, ignore_errors=True)
+        rmtree(self.version_folder(version), ignore_errors=True)
+        manifest = {}
+        with ZipFile(server_zip_path) as server_zip:
+            server_zip.extractall(partial_folder)
+            for info in server_zip.infolist():
+                if not info.is_dir():
+                    manifest[info.filename] = [info.CRC, info.file_size]
+        for path in partial_folder.rglob("*"):
+            if path.is_file():
+                path.chmod(path.stat().st_mode & ~0o222)
+        partial_folder.rename(self.version_folder(version))
+        write_json_atomically(self._manifest_path(version), manifest)
+        return manifest
+
+    @staticmethod
+    def link_or_copy(source: Path, destination: Path) -> None:
+        """
+        Hardlinks source to destination, copying instead if they are on different filesystems.
+        """
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(source, destination)
+        except OSError:
+            VersionStore.copy(source, destination)
+
+    @staticmethod
+    def copy(source: Path, destination: Path) -> None:
+        """
+        Copies source to destination as a private, writable file.
+        """
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.unlink(missing_ok=True)
+        copyfile(source, destination)
+
+    def _prune(self) -> None:
+        """
+        Deletes all but the most recently used versions. Servers keep their hardlinked files regardless.
+        """
+        manifests = sorted(self.folder.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for manifest_path in manifests[self._KEEP_VERSIONS:]:
+            version = manifest_path.stem
+            with self._lock(version):
+                manifest_path.unlink(missing_ok=True)
+                rmtree(self.version_folder(version), ignore_errors=True)
+            self.folder.joinpath(f"{version}.lock").unlink(missing_ok=True)
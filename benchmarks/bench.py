@@ -0,0 +1,212 @@
+"""
+Benchmarks wrapper operations against synthetic servers, fully offline.
+
+A fake download API serves synthetic server zips whose bedrock_server is a scripted fake, servers run under the
+supervisor in a temporary BSW folder, and every operation is timed for each combination of server count and world size.
+
+Run from the repository root:
+    python -m benchmarks.bench --servers 1 5 20 --world-mb 1 50 --output results.json
+    python -m benchmarks.bench --baseline results.json
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import quantiles
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep, monotonic
+from typing import Callable
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from bedrock_server import BedrockServer
+from .fake_download_api import FakeDownloadApi
+
+WORLD_FILE_SIZE = 2 * 1024 * 1024
+REGRESSION_THRESHOLD = 1.2
+
+
+class Recorder:
+    """
+    Collects latency and peak RSS samples per operation and setting.
+    """
+
+    def __init__(self) -> None:
+        self.results: list[dict] = []
+        self._can_reset_peak = self._reset_peak_rss()
+
+    @staticmethod
+    def _reset_peak_rss() -> bool:
+        try:
+            with open("/proc/self/clear_refs", "w") as file:
+                file.write("5")
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _peak_rss_bytes() -> int:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def measure(self, operation: str, settings: dict, action: Callable[[], object], repeat: int = 1) -> None:
+        self.measure_each(operation, settings, [action] * repeat)
+
+    def measure_each(self, operation: str, settings: dict, actions: list[Callable[[], object]]) -> None:
+        samples = []
+        peak_rss = 0
+        for action in actions:
+            if self._can_reset_peak:
+                self._reset_peak_rss()
+            started = perf_counter()
+            action()
+            samples.append(perf_counter() - started)
+            peak_rss = max(peak_rss, self._peak_rss_bytes())
+        self.record(operation, settings, samples, peak_rss)
+
+    def record(self, operation: str, settings: dict, samples: list[float], peak_rss: int) -> None:
+        cut_points = quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+        result = {
+            "operation": operation,
+            **settings,
+            "samples": len(samples),
+            "p50_ms": cut_points[49] * 1000,
+            "p90_ms": cut_points[89] * 1000,
+            "p99_ms": cut_points[98] * 1000,
+            "max_ms": max(samples) * 1000,
+            "peak_rss_mib": peak_rss / 2 ** 20 if self._can_reset_peak else None
+        }
+        self.results.append(result)
+        print(f"{operation:<24} servers={settings['servers']:<3} world_mb={settings['world_mb']:<4} "
+              f"p50={result['p50_ms']:9.2f} ms  p90={result['p90_ms']:9.2f} ms  max={result['max_ms']:9.2f} ms")
+
+
+def wait_until(condition: Callable[[], bool], timeout_seconds: float = 30.0) -> None:
+    deadline = monotonic() + timeout_seconds
+    while not condition():
+        if monotonic() > deadline:
+            raise TimeoutError("Benchmark setup timed out.")
+        sleep(0.02)
+
+
+def build_worlds(server: BedrockServer, world_megabytes: int) -> None:
+    db_folder = server.server_subfolder.joinpath("worlds", "Bedrock level", "db")
+    db_folder.mkdir(parents=True, exist_ok=True)
+    remaining = world_megabytes * 1024 * 1024
+    index = 0
+    while remaining > 0:
+        size = min(WORLD_FILE_SIZE, remaining)
+        db_folder.joinpath(f"{index:06d}.ldb").write_bytes(os.urandom(size))
+        remaining -= size
+        index += 1
+    db_folder.joinpath("CURRENT").write_text("MANIFEST-000001\n")
+
+
+def set_ports(server: BedrockServer, index: int) -> None:
+    properties_path = server.server_subfolder.joinpath("server.properties")
+    content = properties_path.read_text()
+    content = content.replace("server-port=19132", f"server-port={20000 + index * 2}")
+    content = content.replace("server-portv6=19133", f"server-portv6={20001 + index * 2}")
+    properties_path.write_text(content)
+
+
+def run_setting(recorder: Recorder, server_count: int, world_megabytes: int, pack_megabytes: int, repeat: int) -> None:
+    settings = {"servers": server_count, "world_mb": world_megabytes}
+    with TemporaryDirectory(prefix="bsw-bench-") as temporary_folder:
+        bsw_folder = Path(temporary_folder).joinpath("BSW")
+        bsw_folder.mkdir()
+        BedrockServer._DIR = bsw_folder
+        BedrockServer.links_ttl_seconds = 3600
+        with FakeDownloadApi(Path(temporary_folder).joinpath("api"), pack_megabytes) as api:
+            BedrockServer._UPDATE_LINKS_URL = f"{api.url}/links"
+            api.publish("1.0.0")
+            supervisor = subprocess.Popen([
+                sys.executable, "-c",
+                "import sys; from pathlib import Path; from bedrock_server import BedrockServer; "
+                "BedrockServer._DIR = Path(sys.argv[1]); BedrockServer.run_supervisor()",
+                str(bsw_folder)
+            ])
+            try:
+                wait_until(BedrockServer.check_supervisor)
+                run_operations(recorder, settings, api, server_count, world_megabytes, repeat)
+            finally:
+                BedrockServer.shutdown_supervisor()
+                supervisor.wait(60)
+
+
+def run_operations(recorder: Recorder, settings: dict, api: FakeDownloadApi, server_count: int, world_megabytes: int, repeat: int) -> None:
+    names = [f"bench{index:03d}" for index in range(server_count)]
+    servers: list[BedrockServer] = []
+    recorder.measure_each("create", settings, [lambda name=name: servers.append(BedrockServer.create(name)) for name in names])
+    for index, server in enumerate(servers):
+        set_ports(server, index)
+        build_worlds(server, world_megabytes)
+
+    recorder.measure("list_servers", settings, BedrockServer.list_servers, repeat)
+    recorder.measure_each("start", settings, [server.start for server in servers])
+    for server in servers:
+        server._minecraft_execute("bench-join Steve")
+    recorder.measure("get_player_count", settings, servers[0].get_player_count, repeat)
+    recorder.measure("fleet_status", settings, BedrockServer.fleet_status, repeat)
+    recorder.measure("backup_online", settings, lambda: servers[0].backup(0, 100, online=True), repeat)
+    recorder.measure("backup_online_incremental", settings, lambda: servers[0].backup(0, 100, online=True, incremental=True), repeat)
+    recorder.measure_each("restart", settings, [lambda server=server: server.restart(force_stop=True) for server in servers])
+    recorder.measure_each("stop", settings, [lambda server=server: server.stop(force_stop=True) for server in servers])
+    wait_until(lambda: not BedrockServer.list_online_servers())
+    recorder.measure("backup_offline", settings, lambda: servers[0].backup(0, 100), repeat)
+    api.publish("1.0.1")
+    BedrockServer.links_ttl_seconds = 0
+    recorder.measure_each("update", settings, [server._download_and_update for server in servers])
+    print(f"download API requests: {api.links_requests} links, {api.zip_requests} zips")
+
+
+def compare(results: list[dict], baseline_path: Path) -> bool:
+    """
+    :return: Whether no operation got slower than the baseline by more than the regression threshold
+    """
+    with open(baseline_path, "r") as file:
+        baseline = {(result["operation"], result["servers"], result["world_mb"]): result for result in json.load(file)["results"]}
+    passed = True
+    for result in results:
+        previous = baseline.get((result["operation"], result["servers"], result["world_mb"]))
+        if previous is None or not previous["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / previous["p50_ms"]
+        regressed = ratio > REGRESSION_THRESHOLD
+        passed = passed and not regressed
+        print(f"{'REGRESSION' if regressed else 'ok':<10} {result['operation']:<24} servers={result['servers']:<3} "
+              f"world_mb={result['world_mb']:<4} p50 {previous['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms ({ratio:.2f}x)")
+    return passed
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmarks wrapper operations against synthetic servers.")
+    parser.add_argument("--servers", type=int, nargs="+", default=[1, 5], help="Server counts to benchmark.")
+    parser.add_argument("--world-mb", type=int, nargs="+", default=[1, 20], help="World sizes in MiB to benchmark.")
+    parser.add_argument("--pack-mb", type=int, default=5, help="Size in MiB of the synthetic packs in the server zip.")
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per repeated operation.")
+    parser.add_argument("--output", type=Path, help="Writes results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, help="Compares results with this earlier JSON output and fails on regressions.")
+    args = parser.parse_args()
+    recorder = Recorder()
+    for server_count in args.servers:
+        for world_megabytes in args.world_mb:
+            run_setting(recorder, server_count, world_megabytes, args.pack_mb, args.repeat)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump({
+                "python": sys.version,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "results": recorder.results
+            }, file, indent=2)
+    if args.baseline is not None and not compare(recorder.results, args.baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
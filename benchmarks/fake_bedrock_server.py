@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Scripted stand-in for bedrock_server. It answers the console commands the wrapper uses, with the same output lines
+as the real server, and reads world files from the worlds folder next to it for save query.
+"""
+from pathlib import Path
+from time import strftime
+import sys
+
+
+def log(message: str) -> None:
+    print(f"[{strftime('%Y-%m-%d %H:%M:%S')}:000 INFO] {message}", flush=True)
+
+
+def saved_files() -> str:
+    worlds_folder = Path.cwd().joinpath("worlds")
+    files = sorted(path for path in worlds_folder.rglob("*") if path.is_file())
+    return ", ".join(f"{path.relative_to(worlds_folder).as_posix()}:{path.stat().st_size}" for path in files)
+
+
+def main() -> None:
+    players: list[str] = []
+    holding = False
+    log("Server started.")
+    for line in sys.stdin:
+        command = line.strip()
+        if command == "list":
+            print(f"There are {len(players)}/100 players online:", flush=True)
+            print(", ".join(players), flush=True)
+        elif command.startswith("bench-join "):
+            players.append(command.removeprefix("bench-join "))
+            log(f"Player connected: {players[-1]}, xuid: {len(players)}")
+        elif command.startswith("bench-leave "):
+            name = command.removeprefix("bench-leave ")
+            if name in players:
+                players.remove(name)
+                log(f"Player disconnected: {name}, xuid: 0, pfid: 0")
+        elif command == "save hold":
+            holding = True
+            print("Saving...", flush=True)
+        elif command == "save query":
+            if holding:
+                print("Data saved. Files are now ready to be copied.", flush=True)
+                print(saved_files(), flush=True)
+            else:
+                print("A previous save has not been completed.", flush=True)
+        elif command == "save resume":
+            holding = False
+            print("Changes to the level are resumed.", flush=True)
+        elif command.startswith("say "):
+            print(f"[Server] {command.removeprefix('say ')}", flush=True)
+        elif command == "stop":
+            log("Stopping server...")
+            print("Quit correctly", flush=True)
+            return
+        elif command:
+            print(f"Unknown command: {command}. Please check that the command exists and that you have permission to use it.", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Local stand-in for the download links API and the server zip downloads, serving synthetic server zips built from the
+fake bedrock_server.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+import json
+import os
+
+FAKE_SERVER_PATH = Path(__file__).with_name("fake_bedrock_server.py")
+SERVER_PROPERTIES = "\n".join([
+    "server-name=Benchmark",
+    "server-port=19132",
+    "server-portv6=19133",
+    "enable-lan-visibility=false",
+    "level-name=Bedrock level",
+    ""
+])
+
+
+def build_server_zip(path: Path, version: str, pack_megabytes: int) -> None:
+    """
+    Writes a synthetic server zip with the fake server as bedrock_server and incompressible pack files.
+    """
+    with ZipFile(path, "w", ZIP_DEFLATED) as server_zip:
+        executable = ZipInfo("bedrock_server")
+        executable.external_attr = 0o755 << 16
+        server_zip.writestr(executable, FAKE_SERVER_PATH.read_bytes())
+        server_zip.writestr("server.properties", SERVER_PROPERTIES)
+        for name in ["allowlist.json", "permissions.json"]:
+            server_zip.writestr(name, "[]")
+        server_zip.writestr("config/default/permissions.json", "{}")
+        server_zip.writestr("release-notes.txt", f"Version {version}\n")
+        for index in range(pack_megabytes):
+            server_zip.writestr(f"behavior_packs/vanilla/pack_{index}.bin", os.urandom(1024 * 1024))
+
+
+class FakeDownloadApi:
+    """
+    Serves the links API at /links and zips at /bin-linux/bedrock-server-<version>.zip, with Range support.
+    """
+
+    def __init__(self, folder: Path, pack_megabytes: int) -> None:
+        self.folder = folder
+        self.pack_megabytes = pack_megabytes
+        self.version = ""
+        self.links_requests = 0
+        self.zip_requests = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path == "/links":
+                    api.links_requests += 1
+                    body = json.dumps({"result": {"links": [
+                        {"downloadType": "serverBedrockWindows", "downloadUrl": f"{api.url}/bin-win/unused.zip"},
+                        {"downloadType": "serverBedrockLinux", "downloadUrl": f"{api.url}/bin-linux/bedrock-server-{api.version}.zip"}
+                    ]}}).encode()
+                    self._send(200, body, {"ETag": f"\"{api.version}\""})
+                    return
+                zip_path = api.folder.joinpath(Path(self.path).name)
+                if not zip_path.is_file():
+                    self._send(404, b"")
+                    return
+                api.zip_requests += 1
+                data = zip_path.read_bytes()
+                start = 0
+                if range_header := self.headers.get("Range"):
+                    start = int(range_header.removeprefix("bytes=").split("-")[0])
+                self._send(206 if start else 200, data[start:], {"ETag": f"\"{zip_path.name}\""})
+
+            def _send(self, status: int, body: bytes, headers: dict[str, str] | None = None) -> None:
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def publish(self, version: str) -> None:
+        """
+        Builds a zip for the version and makes the links API point at it.
+        """
+        build_server_zip(self.folder.joinpath(f"bedrock-server-{version}.zip"), version, self.pack_megabytes)
+        self.version = version
+
+    def __enter__(self) -> "FakeDownloadApi":
+        self.folder.mkdir(parents=True, exist_ok=True)
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
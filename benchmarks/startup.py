@@ -0,0 +1,86 @@
+"""
+Checks that cheap CLI commands start fast: none of them may import networking, archive or process pool modules, and
+their median wall time must stay within the budget.
+
+Run from the repository root:
+    python -m benchmarks.startup --budget-ms 250
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+import subprocess
+import sys
+
+MAIN_PY = Path(__file__).resolve().parent.parent.joinpath("main.py")
+COMMANDS = [["where", "startup"], ["where", "startup", "--backups"], ["attach", "startup"]]
+# Modules only an update, backup, restore or the supervisor may import
+DEFERRED_MODULES = [
+    "requests",
+    "urllib3",
+    "fake_useragent",
+    "zipfile",
+    "tarfile",
+    "asyncio",
+    "multiprocessing",
+    "concurrent.futures.process"
+]
+# Runs the CLI in-process and records which modules it imported beyond the interpreter's own start-up
+IMPORTS_PROBE = """
+import json, os, runpy, sys
+before = set(sys.modules)
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+with open(os.environ["BSW_STARTUP_MODULES"], "w") as file:
+    json.dump(sorted(set(sys.modules) - before), file)
+"""
+
+
+def imported_modules(command: list[str], environment: dict[str, str], output_path: Path) -> list[str]:
+    subprocess.run(
+        [sys.executable, "-c", IMPORTS_PROBE, str(MAIN_PY), *command],
+        env={**environment, "BSW_STARTUP_MODULES": str(output_path)},
+        stdout=subprocess.DEVNULL,
+        check=True
+    )
+    with open(output_path, "r") as file:
+        return json.load(file)
+
+
+def wall_time_ms(command: list[str], environment: dict[str, str], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        subprocess.run([sys.executable, str(MAIN_PY), *command], env=environment, stdout=subprocess.DEVNULL, check=True)
+        samples.append((perf_counter() - started) * 1000)
+    return median(samples)
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Checks start-up time and imports of cheap CLI commands.")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Most median wall time allowed per command.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command to take the median of.")
+    args = parser.parse_args()
+    passed = True
+    with TemporaryDirectory(prefix="bsw-startup-") as temporary_folder:
+        environment = {**os.environ, "HOME": temporary_folder}
+        for command in COMMANDS:
+            modules = imported_modules(command, environment, Path(temporary_folder).joinpath("modules.json"))
+            deferred = [module for module in DEFERRED_MODULES if module in modules]
+            milliseconds = wall_time_ms(command, environment, args.repeat)
+            ok = not deferred and milliseconds <= args.budget_ms
+            passed = passed and ok
+            print(f"{'ok' if ok else 'FAIL':<4} bsw {' '.join(command):<28} median {milliseconds:7.1f} ms"
+                  + (f"  imports {', '.join(deferred)}" if deferred else ""))
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,71 @@
-from bedrock_server import BedrockServer
+from bedrock_server import BedrockServer, ArchiveWriter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+import sys
 import typer as ty
 
 
 app = ty.Typer(add_completion=False)
 
 
+@app.callback()
+def options(
+        ctx: ty.Context,
+        offline: bool = ty.Option(False, help="Uses cached download links only, without contacting the download API."),
+        links_ttl: int = ty.Option(3600, min=0, help="Seconds to reuse cached download links before checking for updates again.")
+) -> None:
+    BedrockServer.offline = offline
+    BedrockServer.links_ttl_seconds = links_ttl
+    if ctx.invoked_subcommand != "supervisor" and not BedrockServer.check_screen() and not BedrockServer.check_supervisor():
+        print("screen is not installed. Please install it or run the supervisor before using this program.")
+        raise ty.Exit()
+
+
 @app.command(name="list", help="Shows a list of servers you have.")
 def list_servers() -> None:
-    server_list = BedrockServer.list_servers()
-    online_server_list = BedrockServer.list_online_servers()
-    if len(server_list) == 0:
+    fleet_status = BedrockServer.fleet_status()
+    if len(fleet_status) == 0:
         print("You don't have any servers.")
         return
     print("Here are the servers you have (names case-insensitive):\n")
-    for server in server_list:
-        server_object = BedrockServer.load(server)
-        server_object: BedrockServer
-        print(f" -> Name: {server}")
-        print(f"    Ports: {server_object.get_port_number()} (IPv4), {server_object.get_port_number(ipv6=True)} (IPv6)")
-        if server in online_server_list:
-            players = server_object.get_player_count()
-            if players < 0:
-                print(f"    Many are online")
+    for server in fleet_status:
+        print(f" -> Name: {server.name}")
+        print(f"    Ports: {server.port} (IPv4), {server.port_ipv6} (IPv6)")
+        if server.online:
+            if server.players is None:
+                print("    Player count unavailable")
             else:
-                print(f"    {players} online")
+                print(f"    {server.players} online")
         else:
             print("    OFFLINE")
     print()
 
 
+@app.command(help="Shows resource usage of every server and how long wrapper operations take.")
+def stats(
+        textfile: Path | None = ty.Option(None, help="Also writes the metrics to this file in the Prometheus text format.")
+) -> None:
+    metrics = BedrockServer.collect_metrics()
+    if textfile is not None:
+        BedrockServer.write_metrics_textfile(textfile, metrics)
+    if len(metrics) == 0:
+        print("You don't have any servers.")
+        return
+    for server in metrics:
+        print(f" -> Name: {server.name}")
+        if server.process is None:
+            print("    OFFLINE")
+        else:
+            print(f"    PID {server.process.pid}: {server.process.cpu_seconds:.1f} s CPU, {server.process.rss_bytes / 2 ** 20:.0f} MiB RSS, "
+                  f"{server.process.threads} threads, {server.process.open_fds} open files")
+        print(f"    Worlds: {server.world_bytes / 2 ** 20:.1f} MiB, backups: {server.backups_bytes / 2 ** 20:.1f} MiB")
+        for operation, timing in sorted(server.timings.items()):
+            print(f"    {operation}: last {timing.last_seconds:.2f} s, average {timing.total_seconds / timing.count:.2f} s, "
+                  f"max {timing.max_seconds:.2f} s over {timing.count} runs")
+    print()
+
+
 @app.command(help="Creates a new server.")
 def new(server_name: str) -> None:
     response = BedrockServer.create(server_name)
@@ -38,6 +75,46 @@ def new(server_name: str) -> None:
     print(f"Server created at: {response.server_subfolder}")
 
 
+@app.command(help="Runs the supervisor in the foreground, which runs servers directly instead of in screen sessions.")
+def supervisor(shutdown: bool = ty.Option(False, help="Stops the running supervisor and every server it runs instead.")) -> None:
+    if shutdown:
+        BedrockServer.shutdown_supervisor()
+        print("Supervisor stopped.")
+        return
+    try:
+        BedrockServer.run_supervisor()
+    except RuntimeError:
+        print("Supervisor is already running.")
+
+
+@app.command(help="Runs the maintenance scheduler in the foreground, which backs up, restarts and updates servers as set in their bsw.properties.")
+def scheduler() -> None:
+    def report(server_name: str, message: str) -> None:
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {server_name}: {message}", flush=True)
+
+    try:
+        BedrockServer.run_scheduler(report)
+    except RuntimeError:
+        print("Scheduler is already running.")
+    except KeyboardInterrupt:
+        print("Scheduler stopped.")
+
+
+@app.command(help="Connects to the console of the specified server run by the supervisor. Press Ctrl+C to detach.")
+def console(server_name: str) -> None:
+    response = BedrockServer.load(server_name)
+    if isinstance(response, str):
+        print(response)
+        return
+    if not response.is_running():
+        print("Server is not running.")
+        return
+    try:
+        response.attach_console()
+    except ConnectionError:
+        print("Supervisor is not running. Use the attach command for servers run in screen.")
+
+
 @app.command(help="Shows command to attach to the specified server's screen session. Use in: eval \"$(...)\"")
 def attach(server_name: str) -> None:
     response = BedrockServer.load(server_name)
@@ -59,39 +136,152 @@ def where(server_name: str, backups: bool = ty.Option(False, help="Shows path fo
     print(response.server_subfolder)
 
 
-@app.command(help="Starts the specified server.")
-def start(server_name: str) -> None:
-    response = BedrockServer.load(server_name)
+SERVER_NAMES = ty.Argument(None, help="Server names, or globs like \"lobby*\" for several servers.", show_default=False)
+ALL_SERVERS = ty.Option(False, "--all", help="Acts on every server.")
+
+
+def _select_servers(server_names: list[str] | None, all_servers: bool) -> list[BedrockServer] | None:
+    if not all_servers and not server_names:
+        print("Specify at least one server name, or use --all.")
+        return None
+    response = BedrockServer.select_servers(["*"] if all_servers else server_names)
     if isinstance(response, str):
         print(response)
+        return None
+    if not response:
+        print("You don't have any servers.")
+        return None
+    return response
+
+
+def _run_on_servers(servers: list[BedrockServer], action: Callable[[BedrockServer], str], parallel: int, stagger: float) -> None:
+    """
+    Prints the action's message for a single server, or a summary line per server for several.
+    """
+    if len(servers) == 1:
+        print(action(servers[0]))
         return
-    try:
-        response.start()
-    except BedrockServer.ServerRunningError:
-        print("Server already running.")
-    except BedrockServer.PortConflictError:
-        print("Potential ports conflict. Please check the following in server.properties:")
-        print()
-        print(" -> Ensure that no other server is using the same ports.")
-        print(" -> Ensure \"enable-lan-visibility\" is set to \"false\".")
-        print()
-        return
-    else:
-        print(f"Server started.")
-
-
-@app.command(help="Stops the specified server.")
-def stop(server_name: str, force: bool = False) -> None:
-    response = BedrockServer.load(server_name)
-    if isinstance(response, str):
-        print(response)
+    results = BedrockServer.run_bulk(servers, action, parallel, stagger)
+    for result in results:
+        message = result.result if result.error is None else f"Failed: {result.error}"
+        print(f" -> {result.name}: {message}".replace("\n", "\n    "))
+    failed = sum(result.error is not None for result in results)
+    print(f"\nDone with {len(results) - failed} of {len(results)} servers." + (f" {failed} failed." if failed else ""))
+
+
+@app.command(help="Starts the specified servers.")
+def start(
+        server_names: list[str] | None = SERVER_NAMES,
+        all_servers: bool = ALL_SERVERS,
+        parallel: int = ty.Option(4, min=1, help="Most servers to start at once."),
+        stagger: float = ty.Option(2.0, min=0, help="Seconds between starting one server and the next, as loading worlds is disk heavy.")
+) -> None:
+    servers = _select_servers(server_names, all_servers)
+    if servers is None:
         return
-    try:
-        response.stop(force)
-    except BedrockServer.PlayersOnServerError:
-        print("Server cannot be stopped as players are still online. Use the force option to do it anyway.")
+    download_url = BedrockServer.prepare_update(servers) if len(servers) > 1 else None
+
+    def start_server(server: BedrockServer) -> str:
+        try:
+            server.start(download_url)
+        except BedrockServer.ServerRunningError:
+            return "Server already running."
+        except BedrockServer.PortConflictError:
+            return "\n".join([
+                "Potential ports conflict. Please check the following in server.properties:",
+                "",
+                " -> Ensure that no other server is using the same ports.",
+                " -> Ensure \"enable-lan-visibility\" is set to \"false\".",
+                ""
+            ])
+        except ValueError as error:
+            return f"Server cannot start: {error}"
+        return "Server started."
+
+    _run_on_servers(servers, start_server, parallel, stagger)
+
+
+@app.command(help="Stops the specified servers.")
+def stop(
+        server_names: list[str] | None = SERVER_NAMES,
+        all_servers: bool = ALL_SERVERS,
+        force: bool = False,
+        parallel: int = ty.Option(8, min=1, help="Most servers to stop at once."),
+        countdown: int = ty.Option(0, min=0, help="Counts down in chat for this many seconds before stopping.")
+) -> None:
+    servers = _select_servers(server_names, all_servers)
+    if servers is None:
+        return
+    if countdown:
+        BedrockServer.count_down(servers, countdown, "Server stopping in {time}.")
+
+    def stop_server(server: BedrockServer) -> str:
+        try:
+            server.stop(force)
+        except BedrockServer.PlayersOnServerError:
+            return "Server cannot be stopped as players are still online. Use the force option to do it anyway."
+        except TimeoutError:
+            return "Server did not exit even after being killed."
+        return "Server stopped." if not force else "Server force stopped."
+
+    _run_on_servers(servers, stop_server, parallel, 0.0)
+
+
+@app.command(help="Restarts the specified servers, preparing any update before stopping them to keep downtime short.")
+def restart(
+        server_names: list[str] | None = SERVER_NAMES,
+        all_servers: bool = ALL_SERVERS,
+        force: bool = False,
+        parallel: int = ty.Option(4, min=1, help="Most servers to restart at once."),
+        stagger: float = ty.Option(2.0, min=0, help="Seconds between restarting one server and the next, as loading worlds is disk heavy."),
+        countdown: int = ty.Option(0, min=0, help="Counts down in chat for this many seconds before restarting.")
+) -> None:
+    servers = _select_servers(server_names, all_servers)
+    if servers is None:
+        return
+    download_url = BedrockServer.prepare_update(servers)
+    if countdown:
+        BedrockServer.count_down(servers, countdown, "Server restarting in {time}.")
+
+    def restart_server(server: BedrockServer) -> str:
+        try:
+            update_plan = server.restart(force, download_url)
+        except BedrockServer.PlayersOnServerError:
+            return "Server cannot be restarted as players are still online. Use the force option to do it anyway."
+        except BedrockServer.PortConflictError:
+            return "Server stopped, but could not start again due to potential ports conflict. Please check server.properties."
+        except ValueError as error:
+            return f"Server stopped, but could not start again: {error}"
+        except TimeoutError:
+            return "Server did not exit even after being killed."
+        if update_plan is None:
+            return "Server restarted."
+        return f"Server updated and restarted: {len(update_plan.added)} files added, {len(update_plan.changed)} changed, {len(update_plan.remove)} removed."
+
+    _run_on_servers(servers, restart_server, parallel, stagger)
+
+
+@app.command(help="Updates the specified stopped servers to the latest version, downloading it only once.")
+def update(
+        server_names: list[str] | None = SERVER_NAMES,
+        all_servers: bool = ALL_SERVERS,
+        parallel: int = ty.Option(4, min=1, help="Most servers to update at once.")
+) -> None:
+    servers = _select_servers(server_names, all_servers)
+    if servers is None:
         return
-    print("Server stopped." if not force else "Server force stopped.")
+    download_url = BedrockServer.prepare_update(servers)
+
+    def update_server(server: BedrockServer) -> str:
+        try:
+            update_plan = server.update(download_url)
+        except BedrockServer.ServerRunningError:
+            return "Server is running. Stop it before updating."
+        if update_plan is None:
+            return "Server already up to date."
+        return f"Server updated: {len(update_plan.added)} files added, {len(update_plan.changed)} changed, {len(update_plan.remove)} removed."
+
+    _run_on_servers(servers, update_server, parallel, 0.0)
 
 
 @app.command(help="Purges the specified server, removing all saved data.")
@@ -110,46 +300,141 @@ def purge(server_name: str) -> None:
     print("Server purged.")
 
 
-@app.command(help="Sends message to chat of the specified server.")
+@app.command(help="Sends message to chat of the specified servers.")
 def chat(
-        server_name: str,
+        server_name: str = ty.Argument(help="Server name, or a glob like \"lobby*\" or \"*\" for several servers."),
         message: str = ty.Argument(help="Optionally use \"&\" instead of \"§\" for styling.")) -> None:
+    servers = _select_servers([server_name], False)
+    if servers is None:
+        return
+
+    def send_message(server: BedrockServer) -> str:
+        if not server.is_running():
+            return "Server is not running."
+        server.message(message)
+        return "Message sent."
+
+    _run_on_servers(servers, send_message, 16, 0.0)
+
+
+@app.command(help="Sends messages to chat of every running server, batched and rate limited per server.")
+def broadcast(
+        messages: list[str] = ty.Argument(help="Messages in the order to send them. Optionally use \"&\" instead of \"§\" for styling."),
+        rate: float = ty.Option(10.0, min=0.1, help="Most messages per second to send each server after the first burst.")
+) -> None:
+    injections = BedrockServer.broadcast(messages, commands_per_second=rate)
+    if not injections:
+        print("No servers are running.")
+        return
+    print(f"Sent {len(messages)} messages to {len(injections)} servers.")
+
+
+@app.command(help="Creates backups of the specified servers.")
+def backup(
+        server_names: list[str] | None = SERVER_NAMES,
+        all_servers: bool = ALL_SERVERS,
+        force: bool = False,
+        cooldown: int = ty.Option(60, min=0, max=720, help="If the previous backup was less than this many minutes ago, the backup will be skipped."),
+        limit: int = ty.Option(30, min=1, max=100, help="Number of newest backups to keep."),
+        hourly: int = ty.Option(0, min=0, help="Also keeps the newest backup of each of this many recent hours."),
+        daily: int = ty.Option(0, min=0, help="Also keeps the newest backup of each of this many recent days."),
+        weekly: int = ty.Option(0, min=0, help="Also keeps the newest backup of each of this many recent weeks."),
+        budget_mb: int | None = ty.Option(None, min=1, help="Deletes the oldest backups until all backups fit in this many MiB."),
+        online: bool = ty.Option(False, help="Backs up a running server without stopping it, even with players online."),
+        incremental: bool = ty.Option(False, help="Stores a deduplicated snapshot that only takes space for changed files."),
+        archive_format: str = ty.Option("zip", "--format", help=f"Archive format: {', '.join(ArchiveWriter.FORMATS)}."),
+        level: int | None = ty.Option(None, help="Compression level. Defaults to the format's default."),
+        workers: int | None = ty.Option(None, min=1, help="Compression processes or threads. Defaults to one per CPU."),
+        nice: int = ty.Option(0, min=0, max=19, help="Niceness to run compression with, so backups don't slow down running servers."),
+        idle_io: bool = ty.Option(False, help="Only uses otherwise idle disk time for the backup."),
+        parallel: int = ty.Option(2, min=1, help="Most servers to back up at once."),
+        stagger: float = ty.Option(10.0, min=0, help="Seconds between starting one server's backup and the next, so they don't all hit the disk at once.")
+) -> None:
+    servers = _select_servers(server_names, all_servers)
+    if servers is None:
+        return
+    try:
+        archive_writer = ArchiveWriter(archive_format, level, workers, nice, idle_io)
+    except ValueError as error:
+        print(error)
+        return
+    retention = BedrockServer.RetentionPolicy(limit, hourly, daily, weekly, budget_mb * 2 ** 20 if budget_mb else None)
+
+    def backup_server(server: BedrockServer) -> str:
+        try:
+            server.backup(cooldown, retention, force, online, incremental, archive_writer)
+        except FileExistsError:
+            return "Previous backup is too recent. No backup created."
+        except BedrockServer.PlayersOnServerError:
+            return "Server cannot be backed up as players are still online. Use the force option to do it anyway."
+        except TimeoutError:
+            return "Server did not get its world files ready in time. No backup created."
+        return "Backup created."
+
+    _run_on_servers(servers, backup_server, parallel, stagger)
+
+
+@app.command(help="Shows the backups of the specified server, newest first.")
+def backups(server_name: str) -> None:
     response = BedrockServer.load(server_name)
     if isinstance(response, str):
         print(response)
         return
-    if not response.is_running():
-        print("Server is not running.")
+    descriptions = response.describe_backups()
+    if not descriptions:
+        print("No backups found.")
         return
-    response.message(message)
-    print("Message sent.")
+    for description in descriptions:
+        worlds = ", ".join(description.worlds) or "no worlds"
+        print(f"{description.name} - {description.files} files, {description.size / 2 ** 20:.1f} MiB ({worlds})")
 
 
-@app.command(help="Creates backup of the specified server.")
-def backup(
+@app.command(help="Restores the specified server from one of its backups, only extracting files that changed.")
+def restore(
         server_name: str,
-        force: bool = False,
-        cooldown: int = ty.Option(60, min=0, max=720, help="If the previous backup was less than this many minutes ago, the backup will be skipped."),
-        limit: int = ty.Option(30, min=1, max=100, help="Maximum number of backups to keep.")
+        backup_name: str = ty.Argument(help="Backup file name, as shown by the backups command."),
+        world: list[str] = ty.Option([], help="Restores only this world. Can be given more than once."),
+        configs: bool = ty.Option(False, help="Restores only the config files that are kept across updates."),
+        path: list[str] = ty.Option([], help="Restores only this path relative to the server folder. Can be given more than once."),
+        dry_run: bool = ty.Option(False, help="Shows what would be restored without changing any files.")
 ) -> None:
     response = BedrockServer.load(server_name)
     if isinstance(response, str):
         print(response)
         return
+    if response.is_running():
+        print("Server cannot be restored while running.")
+        return
     try:
-        response.backup(cooldown, limit, force)
-    except FileExistsError:
-        print("Previous backup is too recent. No backup created.")
-    except BedrockServer.PlayersOnServerError:
-        print("Server cannot be backed up as players are still online. Use the force option to do it anyway.")
-    else:
-        print("Backup created.")
+        plan = response.plan_restore(backup_name, world, configs, path)
+    except FileNotFoundError:
+        print("Backup not found.")
+        return
+    except ValueError as error:
+        print(error)
+        return
+    for name in plan.extract:
+        print(f" -> Restore {name}")
+    for name in plan.remove:
+        print(f" -> Delete {name}")
+    if not dry_run and not plan.is_empty:
+        if not ty.confirm("Files of the server will be replaced and deleted as listed above. Continue?"):
+            print("Operation canceled.")
+            return
+        try:
+            response.restore(backup_name, plan)
+        except BedrockServer.ServerRunningError:
+            print("Server cannot be restored while running.")
+            return
+    summary = f"{len(plan.extract)} files restored, {len(plan.remove)} deleted, {plan.unchanged} already matching."
+    print(f"Dry run: {summary}" if dry_run else f"Server restored: {summary}")
 
 
 def main() -> None:
-    if not BedrockServer.check_screen():
-        print("screen is not installed. Please install it before using this program.")
-        return
+    # Only a frozen bundle needs this for compression worker processes, and importing multiprocessing slows down startup
+    if getattr(sys, "frozen", False):
+        from multiprocessing import freeze_support
+        freeze_support()
     app()
 
 